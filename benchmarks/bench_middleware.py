@@ -0,0 +1,337 @@
+"""
+Measures the cost ySubs adds to each request.
+
+Drives the Starlette middleware in-process against a mocked Subscriber contract and a temporary database, then
+reports throughput along with p50/p95/p99 latency for the whole request and for each stage of validation.
+
+    python benchmarks/bench_middleware.py
+    python benchmarks/bench_middleware.py --output bench.json
+    python benchmarks/bench_middleware.py --baseline bench.json --threshold 0.25
+
+With --baseline, the exit status is 1 if any scenario's p95 latency or throughput regressed by more than --threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from collections.abc import Awaitable, Callable
+from functools import wraps
+from statistics import quantiles
+from time import perf_counter
+from typing import Any
+
+# NOTE: ysubs reads its config on import, so we point it at a throwaway database first.
+_TMPDIR = tempfile.mkdtemp(prefix="ysubs-bench-")
+os.environ["YSUBS_DB_PATH"] = os.path.join(_TMPDIR, "ysubs.sqlite")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_account import Account
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from tests.mocks import SlowSubscriberContract
+from ysubs import _config, ySubs
+from ysubs.subscriber import Subscriber
+from ysubs.utils import signatures
+
+SUBSCRIBER_ADDRESS = "0x5555555555555555555555555555555555555555"
+UNLIMITED_PLAN = 1
+TINY_PLAN = 2
+PLANS = {
+    UNLIMITED_PLAN: dict(
+        name="Unlimited",
+        price=1,
+        rate_limit_per_minute=10**9,
+        rate_limit_per_day=10**12,
+        time_interval="1 month",
+        is_active=True,
+    ),
+    TINY_PLAN: dict(
+        name="Tiny",
+        price=1,
+        rate_limit_per_minute=1,
+        rate_limit_per_day=10,
+        time_interval="1 month",
+        is_active=True,
+    ),
+}
+# NOTE: Check and record are a single atomic step in every backend, so they are timed together as "limiter".
+STAGES = "total", "checksum", "recovery", "lookup", "limiter"
+
+Signer = tuple[str, str]
+
+
+class StageTimer:
+    """Wraps the methods ySubs calls for each stage and collects how long each call took, in seconds."""
+
+    def __init__(self) -> None:
+        self.samples: defaultdict[str, list[float]] = defaultdict(list)
+
+    def wrap(self, stage: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(perf_counter() - start)
+
+        return timed
+
+    def wrap_async(self, stage: str, fn: Callable[..., Awaitable[Any]]) -> Callable[..., Any]:
+        @wraps(fn)
+        async def timed(*args: Any, **kwargs: Any) -> Any:
+            start = perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(perf_counter() - start)
+
+        return timed
+
+
+def make_signers(count: int) -> list[Signer]:
+    signers = []
+    for _ in range(count):
+        account = Account.create()
+        signature = account.sign_message(_config.UNSIGNED_MESSAGE).signature.hex()
+        signers.append((account.address, signature))
+    return signers
+
+
+def make_ysubs(
+    contract: SlowSubscriberContract, args: argparse.Namespace, timer: StageTimer
+) -> ySubs:
+    # NOTE: We hand ySubs a ready-made Subscriber so it never touches the network to load the contract.
+    subscriber = Subscriber(contract.address, asynchronous=True, _contract=contract)
+    ysubs = ySubs(
+        [contract.address],
+        "https://example.com",
+        asynchronous=True,
+        free_trial_rate_limit=10**6,
+        signature_executor=args.signature_executor,
+        limiter_backend=args.backend,
+        _subscribers=[subscriber],
+    )
+    ysubs._checksum = timer.wrap("checksum", ysubs._checksum)
+    validator = ysubs._signature_validator
+    validator.validate = timer.wrap_async("recovery", validator.validate)
+    ysubs._lookup_paid_subscriptions = timer.wrap_async("lookup", ysubs._lookup_paid_subscriptions)
+    ysubs.backend.check_and_record = timer.wrap_async("limiter", ysubs.backend.check_and_record)
+    return ysubs
+
+
+def reset_caches(ysubs: ySubs) -> None:
+    """Forgets everything ySubs has cached, so the next request from any signer is cold."""
+    signatures._verified.clear()
+    signatures._rejected.clear()
+    ysubs._checksummed.clear()
+    ysubs._rejected_signers.clear()
+    ysubs._rejected_signatures.clear()
+    ysubs._last_known_subscriptions.clear()
+    for subscriber in ysubs.subscribers:
+        subscriber._active_plan_ids_for.clear()
+
+
+async def send_request(app: Starlette, timer: StageTimer, signer: Signer) -> int:
+    address, signature = signer
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/",
+        "raw_path": b"/",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"x-signer", address.encode()), (b"x-signature", signature.encode())],
+        "client": ("127.0.0.1", 8000),
+        "server": ("testserver", 80),
+    }
+    status = 0
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    start = perf_counter()
+    await app(scope, receive, send)
+    timer.samples["total"].append(perf_counter() - start)
+    return status
+
+
+async def run_scenario(
+    app: Starlette,
+    timer: StageTimer,
+    requests: list[Signer],
+    concurrency: int,
+    before_batch: Callable[[], None] | None = None,
+) -> dict[str, Any]:
+    timer.samples.clear()
+    statuses: Counter[int] = Counter()
+    start = perf_counter()
+    for i in range(0, len(requests), concurrency):
+        if before_batch is not None:
+            before_batch()
+        batch = requests[i : i + concurrency]
+        statuses.update(await asyncio.gather(*[send_request(app, timer, s) for s in batch]))
+    seconds = perf_counter() - start
+    return {
+        "requests": len(requests),
+        "seconds": seconds,
+        "requests_per_second": len(requests) / seconds,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "stages": {
+            stage: _summarize(timer.samples[stage]) for stage in STAGES if timer.samples[stage]
+        },
+    }
+
+
+def _summarize(samples: list[float]) -> dict[str, float]:
+    if len(samples) == 1:
+        p50 = p95 = p99 = samples[0]
+    else:
+        cuts = quantiles(samples, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    return {"count": len(samples), "p50": p50 * 1000, "p95": p95 * 1000, "p99": p99 * 1000}
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict[str, Any]]:
+    subscribed = make_signers(args.signers)
+    unsubscribed = make_signers(args.signers)
+    (limited,) = make_signers(1)
+    far_future = 2**40
+    ends = {(UNLIMITED_PLAN, address): far_future for address, _ in subscribed}
+    ends[(TINY_PLAN, limited[0])] = far_future
+
+    timer = StageTimer()
+    ysubs = make_ysubs(
+        SlowSubscriberContract(PLANS, args.rpc_latency, SUBSCRIBER_ADDRESS, ends), args, timer
+    )
+
+    async def home(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/", home)], middleware=[Middleware(ysubs.starlette_middleware)])
+
+    def cycle(signers: list[Signer]) -> list[Signer]:
+        return [signers[i % len(signers)] for i in range(args.requests)]
+
+    def burst() -> list[Signer]:
+        # NOTE: Each batch is 'concurrency' simultaneous requests from one signer.
+        bursts = max(args.requests // args.concurrency, 1)
+        return [
+            subscribed[i % len(subscribed)] for i in range(bursts) for _ in range(args.concurrency)
+        ]
+
+    scenarios: dict[str, Callable[[], Awaitable[dict[str, Any]]]] = {
+        "cold_signers": lambda: run_scenario(
+            app, timer, subscribed, 1, lambda: reset_caches(ysubs)
+        ),
+        "warm_signers": lambda: run_scenario(app, timer, cycle(subscribed), 1),
+        "many_signers": lambda: run_scenario(app, timer, cycle(subscribed), args.concurrency),
+        "burst": lambda: run_scenario(
+            app, timer, burst(), args.concurrency, lambda: reset_caches(ysubs)
+        ),
+        "free_trial": lambda: run_scenario(app, timer, cycle(unsubscribed), 1),
+        "rate_limited": lambda: run_scenario(app, timer, cycle([limited]), 1),
+    }
+    selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+    if unknown := set(selected) - set(scenarios):
+        raise ValueError(f"Unknown scenarios: {sorted(unknown)}. Choose from {list(scenarios)}")
+
+    results = {}
+    try:
+        for name in selected:
+            results[name] = await scenarios[name]()
+            _print_result(name, results[name])
+    finally:
+        await ysubs.close()
+    return results
+
+
+def _print_result(name: str, result: dict[str, Any]) -> None:
+    print(
+        f"{name}: {result['requests']} requests in {result['seconds']:.2f}s "
+        f"({result['requests_per_second']:.1f} req/s), statuses {result['statuses']}"
+    )
+    print(f"  {'stage':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, summary in result["stages"].items():
+        print(
+            f"  {stage:<10}{summary['count']:>8}{summary['p50']:>10.3f}"
+            f"{summary['p95']:>10.3f}{summary['p99']:>10.3f}"
+        )
+    print()
+
+
+def find_regressions(
+    results: dict[str, dict[str, Any]], baseline: dict[str, dict[str, Any]], threshold: float
+) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        p95, baseline_p95 = (
+            result["stages"]["total"]["p95"],
+            baseline[name]["stages"]["total"]["p95"],
+        )
+        if p95 > baseline_p95 * (1 + threshold):
+            regressions.append(f"{name}: p95 latency {p95:.3f}ms vs {baseline_p95:.3f}ms")
+        rps, baseline_rps = result["requests_per_second"], baseline[name]["requests_per_second"]
+        if rps < baseline_rps * (1 - threshold):
+            regressions.append(f"{name}: throughput {rps:.1f} req/s vs {baseline_rps:.1f} req/s")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--backend", default="sqlite", help="the limiter backend to benchmark")
+    parser.add_argument("--signature-executor", choices=["thread", "process"], default=None)
+    parser.add_argument("--signers", type=int, default=200, help="distinct signers per scenario")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight at once")
+    parser.add_argument(
+        "--rpc-latency", type=float, default=0.005, help="seconds per mocked contract call"
+    )
+    parser.add_argument("--scenarios", help="a comma separated subset of scenarios to run")
+    parser.add_argument("--output", help="write the results to this json file")
+    parser.add_argument("--baseline", help="compare the results against this json file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="the largest tolerated regression"
+    )
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(_TMPDIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "scenarios": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["scenarios"]
+        if regressions := find_regressions(results, baseline, args.threshold):
+            print("Regressions:", *regressions, sep="\n  ")
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
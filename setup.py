@@ -20,4 +20,5 @@ setup(
     license="MIT",
     install_requires=requirements,
     setup_requires=["setuptools_scm"],
+    entry_points={"console_scripts": ["ysubs-usage=ysubs.usage:main"]},
 )
@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+# NOTE: ysubs reads its config on import, so we point it at a throwaway database first.
+_TMPDIR = tempfile.mkdtemp(prefix="ysubs-tests-")
+os.environ["YSUBS_DB_PATH"] = os.path.join(_TMPDIR, "ysubs.sqlite")
+os.environ["YSUBS_ABI_CACHE_DIR"] = os.path.join(_TMPDIR, "abis")
+
+import pytest
+
+from tests.mocks import SlowSubscriberContract
+from ysubs.plan import Plan
+from ysubs.subscriber import Subscriber
+from ysubs.subscription import Subscription
+
+
+def make_plan(requests_per_minute: int, requests_per_day: int, name: str = "plan") -> Plan:
+    return Plan(0, requests_per_minute, requests_per_day, "1 month", True, name)
+
+
+def make_subscription(user: str, requests_per_minute: int, requests_per_day: int) -> Subscription:
+    return Subscription(user, make_plan(requests_per_minute, requests_per_day))
+
+
+@pytest.fixture
+def contract() -> SlowSubscriberContract:
+    plan = dict(
+        price=1,
+        rate_limit_per_minute=10,
+        rate_limit_per_day=1000,
+        time_interval="1 month",
+        is_active=True,
+        name="basic",
+    )
+    return SlowSubscriberContract({1: plan})
+
+
+@pytest.fixture
+def subscriber(contract: SlowSubscriberContract) -> Subscriber:
+    return Subscriber(contract.address, asynchronous=True, _contract=contract)
@@ -0,0 +1,56 @@
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+SUBSCRIBER_ADDRESS = "0x000000000000000000000000000000000000dEaD"
+
+
+class _PlanDetails(dict):
+    def dict(self) -> dict:
+        return dict(self)
+
+
+class _Call:
+    def __init__(self, contract: "SlowSubscriberContract", fn: Callable[..., Any]) -> None:
+        self.contract = contract
+        self.fn = fn
+        self.calls = 0
+        # NOTE: The most calls that were waiting on the "node" at once.
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    async def coroutine(self, *args: Any) -> Any:
+        self.calls += 1
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            if self.contract.latency:
+                await asyncio.sleep(self.contract.latency)
+            return self.fn(*args)
+        finally:
+            self._in_flight -= 1
+
+
+class SlowSubscriberContract:
+    """
+    Stands in for a deployed Subscriber contract. Each call waits 'latency' seconds, like a round trip to a node.
+    'latency', 'address' and 'subscription_ends' may be changed at any time.
+    """
+
+    def __init__(
+        self,
+        plans: dict[int, dict],
+        latency: float = 0,
+        address: str = SUBSCRIBER_ADDRESS,
+        subscription_ends: dict[tuple[int, str], int] | None = None,
+    ) -> None:
+        self.latency = latency
+        self.address = address
+        # NOTE: Maps (plan_id, signer) to a subscription end.
+        self.subscription_ends = {} if subscription_ends is None else subscription_ends
+        self.API_VERSION = _Call(self, lambda: "0.1.0")
+        self.plan_count = _Call(self, lambda: len(plans))
+        self.get_plan = _Call(self, lambda plan_id: _PlanDetails(plans[plan_id]))
+        self.subscription_end = _Call(
+            self, lambda plan_id, signer: self.subscription_ends.get((plan_id, signer), 0)
+        )
@@ -0,0 +1,71 @@
+import asyncio
+from time import time
+
+import pytest
+
+from tests.mocks import SlowSubscriberContract
+from ysubs import ySubs
+
+PLANS = 3
+SIGNERS = [f"0x00000000000000000000000000000000000004{i:02x}" for i in range(5)]
+
+
+@pytest.fixture
+def contract() -> SlowSubscriberContract:
+    plans = {
+        id: dict(
+            price=id,
+            rate_limit_per_minute=10 * id,
+            rate_limit_per_day=1000 * id,
+            time_interval="1 month",
+            is_active=True,
+            name=f"plan {id}",
+        )
+        for id in range(1, PLANS + 1)
+    }
+    return SlowSubscriberContract(plans)
+
+
+def test_uncached_signers_are_looked_up_in_one_round(contract, subscriber):
+    ends = int(time()) + 3600
+    contract.subscription_ends.update({(1, signer): ends for signer in SIGNERS})
+
+    async def run():
+        await subscriber.get_all_plans()
+        contract.latency = 0.01
+        first = await subscriber.get_active_subscriptions_many(SIGNERS)
+        calls = contract.subscription_end.calls, contract.subscription_end.max_in_flight
+        second = await subscriber.get_active_subscriptions_many(SIGNERS)
+        return first, calls, second
+
+    first, (calls, in_flight), second = asyncio.run(run())
+    assert calls == in_flight == len(SIGNERS) * PLANS
+    # NOTE: The second lookup is served from the cache.
+    assert contract.subscription_end.calls == calls
+    for subscriptions in (first, second):
+        assert {signer: [s.plan.name for s in subs] for signer, subs in subscriptions.items()} == {
+            signer: ["plan 1"] for signer in SIGNERS
+        }
+
+
+def test_ysubs_fills_in_the_free_trial(contract, subscriber):
+    paid, unpaid = SIGNERS[0], SIGNERS[1]
+    contract.subscription_ends[(2, paid)] = int(time()) + 3600
+    ysubs = ySubs(
+        [],
+        "https://example.com",
+        asynchronous=True,
+        limiter_backend="memory",
+        free_trial_rate_limit=5,
+        _subscribers=[subscriber],
+    )
+
+    async def run():
+        try:
+            return await ysubs.get_active_subscriptions_many([paid, unpaid])
+        finally:
+            await ysubs.close()
+
+    subscriptions = asyncio.run(run())
+    assert [s.plan.name for s in subscriptions[paid]] == ["plan 2"]
+    assert [s.plan.name for s in subscriptions[unpaid]] == ["Free Trial"]
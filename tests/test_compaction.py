@@ -0,0 +1,43 @@
+import asyncio
+from time import time
+
+from tests.conftest import make_subscription
+from ysubs.backends.sqlite import SQLiteBackend
+from ysubs.utils import sqlite
+from ysubs.utils.sqlite import UserRequest, prune_stale
+from ysubs.utils.time import ONE_DAY
+
+
+def test_prune_stale_only_deletes_expired_requests():
+    stale, fresh = (
+        "0xc0000000000000000000000000000000000000a1",
+        "0xc0000000000000000000000000000000000000a2",
+    )
+    t = time()
+
+    async def run():
+        await UserRequest.record_requests({stale: [t - ONE_DAY - 10] * 5, fresh: [t - 10] * 3})
+        # NOTE: A batch size smaller than the backlog makes sure we keep going until it's cleared.
+        deleted = await prune_stale(batch_size=2)
+        return deleted, await SQLiteBackend().time_til_next(make_subscription(fresh, 3, 100))
+
+    deleted, next = asyncio.run(run())
+    assert deleted >= 5
+    assert next > 0
+    assert asyncio.run(prune_stale()) == 0
+
+
+def test_close_stops_compaction():
+    backend = SQLiteBackend()
+    subscription = make_subscription("0xc0000000000000000000000000000000000000b1", 10, 100)
+
+    async def run():
+        await backend.check_and_record([subscription])
+        compactor = sqlite._compactor
+        await backend.close()
+        await asyncio.sleep(0)
+        return compactor
+
+    compactor = asyncio.run(run())
+    assert compactor.cancelled()
+    assert sqlite._compactor is None
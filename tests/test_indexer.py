@@ -0,0 +1,230 @@
+import asyncio
+import sys
+import types
+from time import time
+
+import pytest
+from brownie.convert.datatypes import EthAddress
+
+from ysubs.subscriber import Subscriber
+from ysubs.utils.sqlite import IndexedSubscription, IndexerCheckpoint
+
+try:
+    from ysubs import indexer
+except Exception:
+    # NOTE: ysubs.utils.dank_mids needs a connected node on import. Every test below swaps in a FakeChain anyway.
+    sys.modules["ysubs.utils.dank_mids"] = types.ModuleType("ysubs.utils.dank_mids")
+    sys.modules["ysubs.utils.dank_mids"].dank_w3 = None
+    from ysubs import indexer
+
+SIGNER_A = "0x000000000000000000000000000000000000000A"
+SIGNER_B = "0x000000000000000000000000000000000000000b"
+
+
+class FakeChain:
+    """Stands in for dank_w3. Logs are already decoded events, since the tests also replace _decode_logs."""
+
+    def __init__(self, head: int, deployed_at: int = 0) -> None:
+        self.eth = self
+        self.head = head
+        self.deployed_at = deployed_at
+        self.events: list[tuple[int, dict]] = []
+        self.fail_from: set[int] = set()
+        self.ranges: list[tuple[int, int]] = []
+
+    @property
+    def block_number(self):
+        async def block_number() -> int:
+            return self.head
+
+        return block_number()
+
+    def emit(self, block: int, signer: str, plan_id: int = 1) -> None:
+        self.events.append((block, {"subscriber": EthAddress(signer), "plan_id": plan_id}))
+
+    async def get_logs(self, params: dict) -> list[dict]:
+        from_block, to_block = params["fromBlock"], params["toBlock"]
+        self.ranges.append((from_block, to_block))
+        if from_block in self.fail_from:
+            self.fail_from.remove(from_block)
+            raise ConnectionError("the node is down")
+        return [event for block, event in self.events if from_block <= block <= to_block]
+
+    async def get_code(self, address: str, block: int) -> bytes:
+        return b"\x60" if block >= self.deployed_at else b""
+
+
+@pytest.fixture
+def chain(monkeypatch) -> FakeChain:
+    chain = FakeChain(head=29)
+    monkeypatch.setattr(indexer, "dank_w3", chain)
+    monkeypatch.setattr(indexer, "_decode_logs", lambda logs: logs)
+    return chain
+
+
+@pytest.fixture
+def indexed_contract(contract, request):
+    # NOTE: Every test shares one database, so each indexes its own Subscriber address.
+    contract.address = "0x" + format(abs(hash(request.node.name)), "040x")[:40]
+    return contract
+
+
+def test_checkpoint_starts_empty():
+    assert asyncio.run(IndexerCheckpoint.get_block("0xempty")) is None
+
+
+def test_checkpoint_resumes_from_the_last_indexed_block():
+    subscriber = "0xresume"
+
+    async def run():
+        await IndexedSubscription.index(subscriber, {}, 100)
+        first = await IndexerCheckpoint.get_block(subscriber)
+        await IndexedSubscription.index(subscriber, {}, 250)
+        return first, await IndexerCheckpoint.get_block(subscriber)
+
+    assert asyncio.run(run()) == (100, 250)
+
+
+def test_checkpoints_are_kept_per_subscriber():
+    async def run():
+        await IndexedSubscription.index("0xone", {}, 10)
+        await IndexedSubscription.index("0xtwo", {}, 20)
+        return await IndexerCheckpoint.get_block("0xone"), await IndexerCheckpoint.get_block(
+            "0xtwo"
+        )
+
+    assert asyncio.run(run()) == (10, 20)
+
+
+def test_active_plan_ids_only_include_unexpired_subscriptions():
+    subscriber = "0xactive"
+    now = int(time())
+
+    async def run():
+        await IndexedSubscription.index(
+            subscriber, {"0xsigner": {1: now + 3600, 2: now - 1, 3: now + 60}}, 5
+        )
+        return await IndexedSubscription.active_plan_ids_for(subscriber, ["0xsigner", "0xnobody"])
+
+    active = asyncio.run(run())
+    assert sorted(active["0xsigner"]) == [1, 3]
+    assert active["0xnobody"] == ()
+
+
+def test_reindexing_a_signer_replaces_their_plans():
+    subscriber = "0xreplace"
+    now = int(time())
+
+    async def run():
+        await IndexedSubscription.index(subscriber, {"0xsigner": {1: now + 3600}}, 5)
+        await IndexedSubscription.index(subscriber, {"0xsigner": {2: now + 3600}}, 6)
+        return await IndexedSubscription.active_plan_ids_for(subscriber, ["0xsigner"])
+
+    assert asyncio.run(run()) == {"0xsigner": (2,)}
+
+
+def test_signers_not_in_a_range_are_left_alone():
+    subscriber = "0xuntouched"
+    now = int(time())
+
+    async def run():
+        await IndexedSubscription.index(subscriber, {"0xa": {1: now + 3600}}, 5)
+        await IndexedSubscription.index(subscriber, {"0xb": {1: now + 3600}}, 6)
+        return await IndexedSubscription.active_plan_ids_for(subscriber, ["0xa", "0xb"])
+
+    assert asyncio.run(run()) == {"0xa": (1,), "0xb": (1,)}
+
+
+def test_sync_reindexes_only_signers_named_in_new_events(chain, indexed_contract):
+    now = int(time())
+    indexed_contract.subscription_ends.update(
+        {(1, SIGNER_A): now + 3600, (1, SIGNER_B): now + 3600}
+    )
+    subscriber = Subscriber(indexed_contract.address, asynchronous=True, _contract=indexed_contract)
+    chain.emit(5, SIGNER_A)
+    chain.emit(15, SIGNER_B)
+    chain.head = 19
+    idx = indexer.SubscriptionIndexer(subscriber, start_block=0, chunk_size=10)
+
+    async def run():
+        await idx.sync()
+        first = await idx.active_plan_ids_for([SIGNER_A, SIGNER_B])
+        calls = indexed_contract.subscription_end.calls
+        # NOTE: A's subscription has ended since, and only A shows up in the new blocks.
+        indexed_contract.subscription_ends[(1, SIGNER_A)] = now - 1
+        chain.emit(25, SIGNER_A)
+        chain.head = 29
+        await idx.sync()
+        second = await idx.active_plan_ids_for([SIGNER_A, SIGNER_B])
+        return first, indexed_contract.subscription_end.calls - calls, second
+
+    first, calls, second = asyncio.run(run())
+    assert first == {SIGNER_A: (1,), SIGNER_B: (1,)}
+    assert calls == 1
+    assert second == {SIGNER_A: (), SIGNER_B: (1,)}
+    assert asyncio.run(IndexerCheckpoint.get_block(indexed_contract.address)) == 29
+
+
+def test_sync_resumes_after_a_failed_range(chain, indexed_contract):
+    indexed_contract.subscription_ends[(1, SIGNER_B)] = int(time()) + 3600
+    subscriber = Subscriber(indexed_contract.address, asynchronous=True, _contract=indexed_contract)
+    chain.emit(15, SIGNER_B)
+    chain.fail_from.add(10)
+    idx = indexer.SubscriptionIndexer(subscriber, start_block=0, chunk_size=10)
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await idx.sync()
+        checkpoint = await IndexerCheckpoint.get_block(indexed_contract.address)
+        chain.ranges.clear()
+        await idx.sync()
+        return checkpoint, await idx.active_plan_ids_for([SIGNER_B])
+
+    checkpoint, active = asyncio.run(run())
+    assert checkpoint == 9
+    assert chain.ranges == [(10, 19), (20, 29)]
+    assert active == {SIGNER_B: (1,)}
+    assert idx.synced
+
+
+def test_a_fresh_index_starts_at_the_deployment_block(chain, indexed_contract):
+    chain.head, chain.deployed_at = 5000, 1234
+    subscriber = Subscriber(indexed_contract.address, asynchronous=True, _contract=indexed_contract)
+    idx = indexer.SubscriptionIndexer(subscriber, chunk_size=1000)
+    asyncio.run(idx.sync())
+    assert idx.start_block == 1234
+    assert chain.ranges[0] == (1234, 2233)
+
+
+def test_subscriber_answers_from_the_index_once_synced(chain, indexed_contract):
+    indexed_contract.subscription_ends[(1, SIGNER_A)] = int(time()) + 3600
+    chain.emit(5, SIGNER_A)
+    subscriber = Subscriber(
+        indexed_contract.address,
+        asynchronous=True,
+        indexed=True,
+        index_start_block=0,
+        _contract=indexed_contract,
+    )
+    calls = indexed_contract.subscription_end
+
+    async def run():
+        try:
+            # NOTE: Until the index has caught up, lookups go to the chain.
+            before = await subscriber.get_active_subscriptions(SIGNER_A)
+            assert calls.calls
+            await subscriber.indexer.sync()
+            subscriber._active_plan_ids_for.clear()
+            during = calls.calls
+            synced = await subscriber.get_active_subscriptions(SIGNER_A)
+            assert calls.calls == during
+            # NOTE: An index that hasn't synced in a while can't be trusted, so we ask the chain again.
+            subscriber.indexer.last_synced_at = time() - subscriber.indexer.max_lag - 1
+            stale = await subscriber.get_active_subscriptions(SIGNER_A)
+            assert calls.calls > during
+            return before, synced, stale
+        finally:
+            subscriber.close()
+
+    for subscriptions in asyncio.run(run()):
+        assert [s.plan.name for s in subscriptions] == ["basic"]
@@ -0,0 +1,111 @@
+import asyncio
+from time import perf_counter, time
+
+import pytest
+
+from ysubs import ySubs
+from ysubs.exceptions import SubscriptionLookupTimeout
+
+SIGNER = "0x0000000000000000000000000000000000000001"
+
+
+def make_ysubs(subscriber, lookup_timeout: float | None, max_staleness: float = 60) -> ySubs:
+    return ySubs(
+        [],
+        "https://example.com",
+        asynchronous=True,
+        limiter_backend="memory",
+        lookup_timeout=lookup_timeout,
+        max_staleness=max_staleness,
+        _subscribers=[subscriber],
+    )
+
+
+def test_fails_fast_without_a_last_known_state(contract, subscriber):
+    contract.subscription_ends[(1, SIGNER)] = int(time()) + 3600
+    ysubs = make_ysubs(subscriber, lookup_timeout=0.05)
+
+    async def run():
+        await subscriber.get_all_plans()
+        contract.latency = 1
+        start = perf_counter()
+        try:
+            with pytest.raises(SubscriptionLookupTimeout):
+                await ysubs.get_active_subscripions(SIGNER)
+            return perf_counter() - start
+        finally:
+            await ysubs.close()
+
+    assert asyncio.run(run()) < 0.5
+
+
+def test_serves_the_last_known_state_and_refreshes_in_the_background(contract, subscriber):
+    contract.subscription_ends[(1, SIGNER)] = int(time()) + 3600
+    ysubs = make_ysubs(subscriber, lookup_timeout=0.05)
+
+    async def run():
+        try:
+            first = await ysubs.get_active_subscripions(SIGNER)
+            # NOTE: The subscription has since ended, but the chain is too slow to tell us in time.
+            contract.subscription_ends[(1, SIGNER)] = int(time()) - 1
+            contract.latency = 0.2
+            subscriber._active_plan_ids_for.clear()
+            stale = await ysubs.get_active_subscripions(SIGNER)
+            await asyncio.sleep(0.5)
+            return first, stale, ysubs._last_known_subscriptions.get(SIGNER)
+        finally:
+            await ysubs.close()
+
+    first, stale, refreshed = asyncio.run(run())
+    assert [s.plan.name for s in first] == ["basic"]
+    assert [s.plan.name for s in stale] == ["basic"]
+    assert refreshed == []
+
+
+def test_does_not_serve_state_older_than_max_staleness(contract, subscriber):
+    contract.subscription_ends[(1, SIGNER)] = int(time()) + 3600
+    ysubs = make_ysubs(subscriber, lookup_timeout=0.05, max_staleness=0.1)
+
+    async def run():
+        try:
+            await ysubs.get_active_subscripions(SIGNER)
+            contract.latency = 1
+            subscriber._active_plan_ids_for.clear()
+            await asyncio.sleep(0.2)
+            with pytest.raises(SubscriptionLookupTimeout):
+                await ysubs.get_active_subscripions(SIGNER)
+        finally:
+            await ysubs.close()
+
+    asyncio.run(run())
+
+
+def test_waits_for_the_chain_without_a_timeout(contract, subscriber):
+    contract.subscription_ends[(1, SIGNER)] = int(time()) + 3600
+    ysubs = make_ysubs(subscriber, lookup_timeout=None)
+
+    async def run():
+        await subscriber.get_all_plans()
+        contract.latency = 0.1
+        try:
+            return await ysubs.get_active_subscripions(SIGNER)
+        finally:
+            await ysubs.close()
+
+    assert [s.plan.name for s in asyncio.run(run())] == ["basic"]
+
+
+def test_concurrent_lookups_share_one_set_of_calls(contract, subscriber):
+    contract.subscription_ends[(1, SIGNER)] = int(time()) + 3600
+    ysubs = make_ysubs(subscriber, lookup_timeout=1)
+
+    async def run():
+        await subscriber.get_all_plans()
+        contract.latency = 0.05
+        try:
+            await asyncio.gather(*[ysubs.get_active_subscripions(SIGNER) for _ in range(10)])
+        finally:
+            await ysubs.close()
+
+    asyncio.run(run())
+    assert contract.subscription_end.calls == 1
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from tests.conftest import make_subscription
+from ysubs.backends.redis import RedisBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def server() -> "fakeredis.FakeServer":
+    return fakeredis.FakeServer()
+
+
+def make_backend(server: "fakeredis.FakeServer") -> RedisBackend:
+    return RedisBackend(client=fakeredis.FakeAsyncRedis(server=server))
+
+
+def test_admits_up_to_the_minute_limit(server):
+    backend = make_backend(server)
+    subscription = make_subscription("0xa", 3, 100)
+
+    async def run():
+        admitted = [await backend.check_and_record([subscription]) for _ in range(3)]
+        return admitted, await backend.check_and_record([subscription])
+
+    admitted, rejected = asyncio.run(run())
+    assert admitted == [0, 0, 0]
+    assert 59 < rejected <= 60
+
+
+def test_time_til_next_does_not_record(server):
+    backend = make_backend(server)
+    subscription = make_subscription("0xb", 1, 100)
+
+    async def run():
+        checks = [await backend.time_til_next(subscription) for _ in range(5)]
+        return checks, await backend.check_and_record([subscription])
+
+    checks, admitted = asyncio.run(run())
+    assert checks == [0] * 5
+    assert admitted == 0
+
+
+def test_any_plan_with_room_admits_the_request(server):
+    backend = make_backend(server)
+    tight = make_subscription("0xc", 1, 100)
+    loose = make_subscription("0xc", 5, 100)
+
+    async def run():
+        return [await backend.check_and_record([tight, loose]) for _ in range(6)]
+
+    results = asyncio.run(run())
+    assert results[:5] == [0] * 5
+    assert results[5] > 0
+
+
+def test_zero_limit_never_admits(server):
+    backend = make_backend(server)
+    subscription = make_subscription("0xd", 0, 100)
+
+    async def run():
+        return await backend.check_and_record([subscription]), await backend.time_til_next(
+            subscription
+        )
+
+    assert asyncio.run(run()) == (60, 60)
+
+
+def test_record_request_counts_toward_limits(server):
+    backend = make_backend(server)
+    subscription = make_subscription("0xe", 2, 100)
+
+    async def run():
+        await backend.record_request(subscription.user)
+        await backend.record_request(subscription.user)
+        return await backend.time_til_next(subscription)
+
+    assert asyncio.run(run()) > 0
+
+
+def test_nodes_sharing_a_server_share_limits(server):
+    # NOTE: Each backend stands in for a worker on a different host.
+    nodes = [make_backend(server) for _ in range(3)]
+    subscription = make_subscription("0xf", 4, 100)
+
+    async def run():
+        return await asyncio.gather(*[node.check_and_record([subscription]) for node in nodes * 2])
+
+    results = asyncio.run(run())
+    assert results.count(0) == 4
@@ -0,0 +1,33 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from ysubs import ySubs
+
+
+def make_ysubs(subscriber, signature_executor) -> ySubs:
+    return ySubs(
+        [],
+        "https://example.com",
+        asynchronous=True,
+        limiter_backend="memory",
+        signature_executor=signature_executor,
+        _subscribers=[subscriber],
+    )
+
+
+def test_close_shuts_down_an_executor_ysubs_created(subscriber):
+    ysubs = make_ysubs(subscriber, "thread")
+    executor = ysubs._signature_validator.executor
+    asyncio.run(ysubs.close())
+    assert executor._shutdown
+
+
+def test_close_leaves_a_callers_executor_running(subscriber):
+    executor = ThreadPoolExecutor(1)
+    ysubs = make_ysubs(subscriber, executor)
+    try:
+        asyncio.run(ysubs.close())
+        assert not executor._shutdown
+        assert executor.submit(int, "1").result() == 1
+    finally:
+        executor.shutdown()
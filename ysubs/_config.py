@@ -16,3 +16,78 @@ VALIDATION_INTERVAL = int(os.environ.get("YSUBS_VALIDATION_INTERVAL", 60 * 5))
 
 # Specify the file path for the creation of local ysubs database
 DB_PATH = os.environ.get("YSUBS_DB_PATH", "/.ysubs/ysubs.sqlite")
+
+# Specify the directory in which to cache the ABIs of Subscriber contracts, so restarts don't need to fetch them from an explorer.
+ABI_CACHE_DIR = os.environ.get(
+    "YSUBS_ABI_CACHE_DIR", os.path.join(os.path.dirname(DB_PATH), "abis")
+)
+
+# Specify how many verified (signer, signature) pairs to keep in memory. Failed verifications are cached separately with the same bound.
+SIGNATURE_CACHE_SIZE = int(os.environ.get("YSUBS_SIGNATURE_CACHE_SIZE", 10_000))
+
+# Specify how many signers' active subscriptions to keep in memory per Subscriber contract.
+SUBSCRIPTION_CACHE_SIZE = int(os.environ.get("YSUBS_SUBSCRIPTION_CACHE_SIZE", 10_000))
+
+# Specify how many X-Signer headers to remember the checksummed address for.
+CHECKSUM_CACHE_SIZE = int(os.environ.get("YSUBS_CHECKSUM_CACHE_SIZE", 10_000))
+
+# Specify the maximum time, in seconds, to trust a cached active subscription before checking the chain again. Entries always expire when the subscription does.
+SUBSCRIPTION_REFRESH_INTERVAL = int(
+    os.environ.get("YSUBS_SUBSCRIPTION_REFRESH_INTERVAL", VALIDATION_INTERVAL)
+)
+
+# Specify the most time, in seconds, a request may wait on the chain for a signer's subscriptions. Unset to wait indefinitely.
+SUBSCRIPTION_LOOKUP_TIMEOUT = (
+    float(os.environ["YSUBS_SUBSCRIPTION_LOOKUP_TIMEOUT"])
+    if os.environ.get("YSUBS_SUBSCRIPTION_LOOKUP_TIMEOUT")
+    else None
+)
+
+# Specify for how long, in seconds, a signer's last known subscriptions may be served when a lookup exceeds the timeout above.
+SUBSCRIPTION_MAX_STALENESS = int(os.environ.get("YSUBS_SUBSCRIPTION_MAX_STALENESS", 60 * 60))
+
+# Specify for how long, in seconds, to remember that a signer has no active subscriptions.
+NEGATIVE_SUBSCRIPTION_TTL = int(os.environ.get("YSUBS_NEGATIVE_SUBSCRIPTION_TTL", 30))
+
+# Specify how many rejected signers and malformed signatures to remember, and for how long in seconds, so repeat offenders are turned away without any work.
+REJECTION_CACHE_SIZE = int(os.environ.get("YSUBS_REJECTION_CACHE_SIZE", 10_000))
+REJECTION_CACHE_TTL = int(os.environ.get("YSUBS_REJECTION_CACHE_TTL", NEGATIVE_SUBSCRIPTION_TTL))
+
+# Specify how many blocks of Subscriber events to fetch per request when indexing subscriptions.
+INDEXER_CHUNK_SIZE = int(os.environ.get("YSUBS_INDEXER_CHUNK_SIZE", 10_000))
+
+# Specify how often, in seconds, an indexed Subscriber checks the chain for new events. Purchases take up to this long to be seen.
+INDEXER_POLL_INTERVAL = int(os.environ.get("YSUBS_INDEXER_POLL_INTERVAL", 15))
+
+# Specify after how many poll intervals without a successful sync an indexed Subscriber stops trusting its index and asks the chain instead.
+INDEXER_MAX_LAG_POLLS = int(os.environ.get("YSUBS_INDEXER_MAX_LAG_POLLS", 4))
+
+# Specify how far back, in seconds, ySubs.warm_up looks for active users, and how many of them it prefetches at most.
+WARM_UP_WINDOW = int(os.environ.get("YSUBS_WARM_UP_WINDOW", 60 * 60 * 24))
+WARM_UP_LIMIT = int(os.environ.get("YSUBS_WARM_UP_LIMIT", SUBSCRIPTION_CACHE_SIZE))
+
+# Specify how many users ySubs.warm_up looks up per batch, and how many batches may be in flight at once.
+WARM_UP_BATCH_SIZE = int(os.environ.get("YSUBS_WARM_UP_BATCH_SIZE", 100))
+WARM_UP_CONCURRENCY = int(os.environ.get("YSUBS_WARM_UP_CONCURRENCY", 4))
+
+# Specify how many users' usage is read from the database per query when exporting usage.
+USAGE_EXPORT_CHUNK_SIZE = int(os.environ.get("YSUBS_USAGE_EXPORT_CHUNK_SIZE", 1_000))
+
+# Specify after how many WebSocket messages, or seconds, a connection charges its messages to the limiter backend. Messages are checked in memory in between.
+WEBSOCKET_FLUSH_SIZE = int(os.environ.get("YSUBS_WEBSOCKET_FLUSH_SIZE", 100))
+WEBSOCKET_FLUSH_INTERVAL = int(os.environ.get("YSUBS_WEBSOCKET_FLUSH_INTERVAL", 5))
+
+# Specify the url of the Redis server to use when ySubs is created with limiter_backend="redis".
+REDIS_URL = os.environ.get("YSUBS_REDIS_URL", "redis://localhost:6379/0")
+
+# Specify how many threads may read from the local ysubs database at once. All writes happen on one dedicated thread.
+DB_READER_THREADS = int(os.environ.get("YSUBS_DB_READER_THREADS", 4))
+
+# Specify how often, in seconds, to prune request history older than a day from the local ysubs database.
+DB_COMPACTION_INTERVAL = int(os.environ.get("YSUBS_DB_COMPACTION_INTERVAL", 60 * 5))
+
+# Specify how many rows to delete per transaction while pruning, so writers are never blocked for long.
+DB_COMPACTION_BATCH_SIZE = int(os.environ.get("YSUBS_DB_COMPACTION_BATCH_SIZE", 1_000))
+
+# Set this to any value to return freed pages to the filesystem after pruning. This only has an effect on databases created with auto_vacuum=INCREMENTAL, which ysubs does for new databases.
+DB_INCREMENTAL_VACUUM = bool(os.environ.get("YSUBS_DB_INCREMENTAL_VACUUM"))
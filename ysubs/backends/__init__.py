@@ -0,0 +1,38 @@
+from typing import Literal
+
+from ysubs import _config
+from ysubs.backends.base import LimiterBackend
+from ysubs.backends.gcra import GCRABackend
+from ysubs.backends.memory import MemoryBackend
+
+BackendSpec = LimiterBackend | Literal["sqlite", "memory", "gcra", "redis"]
+
+_default: LimiterBackend | None = None
+
+
+def get_backend(backend: BackendSpec) -> LimiterBackend:
+    if isinstance(backend, LimiterBackend):
+        return backend
+    if backend == "sqlite":
+        # NOTE: We import this lazily so that using another backend doesn't create the database.
+        from ysubs.backends.sqlite import SQLiteBackend
+
+        return SQLiteBackend()
+    if backend == "memory":
+        return MemoryBackend()
+    if backend == "gcra":
+        return GCRABackend()
+    if backend == "redis":
+        from ysubs.backends.redis import RedisBackend
+
+        return RedisBackend(_config.REDIS_URL)
+    raise ValueError(
+        f"'backend' must be a LimiterBackend, 'sqlite', 'memory', 'gcra', or 'redis'. You passed {backend}"
+    )
+
+
+def default_backend() -> LimiterBackend:
+    global _default
+    if _default is None:
+        _default = get_backend("sqlite")
+    return _default
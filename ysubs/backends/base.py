@@ -0,0 +1,50 @@
+from abc import ABC, abstractmethod
+from asyncio import gather
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+from brownie.convert.datatypes import EthAddress
+
+if TYPE_CHECKING:
+    from ysubs.subscription import Subscription
+
+
+class LimiterBackend(ABC):
+    """Stores request history and decides whether a user may make another request."""
+
+    @abstractmethod
+    async def time_til_next(self, subscription: "Subscription") -> float:
+        """Returns the number of seconds until 'subscription' permits another request, or 0 if it does now."""
+
+    @abstractmethod
+    async def record_request(self, address: EthAddress) -> None:
+        """Records that 'address' has made a request."""
+
+    async def record_requests(self, address: EthAddress, count: int) -> None:
+        """Records that 'address' has made 'count' requests. Backends that can should override this to write them at once."""
+        for _ in range(count):
+            await self.record_request(address)
+
+    async def check_and_record(self, subscriptions: list["Subscription"]) -> float:
+        """
+        Records a request and returns 0 if any of 'subscriptions' permits one.
+        Otherwise, returns the number of seconds until one will.
+        """
+        next = min(await gather(*map(self.time_til_next, subscriptions)))
+        if next > 0:
+            return next
+        await self.record_request(subscriptions[0].user)
+        return 0
+
+    async def close(self) -> None:
+        """Releases any resources held by the backend."""
+
+
+def _time_til_next(timestamps: Sequence[float], limit: int, window: float, now: float) -> float:
+    """'timestamps' must be sorted and only contain requests made within the last 'window' seconds."""
+    if limit <= 0:
+        return window
+    if len(timestamps) < limit:
+        return 0
+    next = window - (now - timestamps[-limit])
+    return next if next > 0 else 0
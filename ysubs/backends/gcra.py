@@ -0,0 +1,91 @@
+from time import time
+from typing import TYPE_CHECKING, Literal
+
+from brownie.convert.datatypes import EthAddress
+
+from ysubs.backends.base import LimiterBackend
+from ysubs.utils import gcra
+from ysubs.utils.time import ONE_MINUTE
+
+if TYPE_CHECKING:
+    from ysubs.subscription import Subscription
+
+
+class GCRABackend(LimiterBackend):
+    """
+    Enforces limits with the Generic Cell Rate Algorithm, keeping two floats per (user, plan) instead of a request history.
+
+    Each request is charged to the first of the user's plans that permits it. Plans are identified by their limits.
+    State lives in process memory with store="memory" or in the local ysubs database with store="sqlite".
+    """
+
+    def __init__(self, store: Literal["memory", "sqlite"] = "memory") -> None:
+        if store not in ("memory", "sqlite"):
+            raise ValueError(f"'store' must be 'memory' or 'sqlite'. You passed {store}")
+        self.store = store
+        self._states: dict[tuple[EthAddress, gcra.Limits], gcra.State] = {}
+        self._last_sweep = time()
+
+    async def time_til_next(self, subscription: "Subscription") -> float:
+        limits = _limits(subscription)
+        if self.store == "sqlite":
+            from ysubs.utils.sqlite import UserLimiterState
+
+            return await UserLimiterState.time_til_next(subscription.user, limits)
+        state = self._states.get((subscription.user, limits), gcra.EMPTY_STATE)
+        return gcra.check({limits: state}, time())[0]
+
+    async def record_request(self, address: EthAddress) -> None:
+        """
+        Charges a request to the tightest plan 'address' has used, without checking whether it permits one.
+        We don't know the limits of a user we've never charged, so their request is not recorded.
+        """
+        if self.store == "sqlite":
+            from ysubs.utils.sqlite import UserLimiterState
+
+            return await UserLimiterState.record_request(address)
+        # NOTE: This scans every state, but ySubs always goes through check_and_record instead.
+        known = [limits for user, limits in self._states if user == address]
+        if known:
+            limits = gcra.tightest(known)
+            self._states[(address, limits)] = gcra.record(
+                limits, self._states[(address, limits)], time()
+            )
+
+    async def check_and_record(self, subscriptions: list["Subscription"]) -> float:
+        address = subscriptions[0].user
+        limits = list(dict.fromkeys(map(_limits, subscriptions)))
+        if self.store == "sqlite":
+            from ysubs.utils.sqlite import UserLimiterState, start_compaction
+
+            start_compaction()
+            return await UserLimiterState.check_and_record(address, limits)
+
+        now = time()
+        if now - self._last_sweep >= ONE_MINUTE:
+            self._sweep(now)
+        states = {l: self._states.get((address, l), gcra.EMPTY_STATE) for l in limits}
+        next, admitted = gcra.check(states, now)
+        if admitted is None:
+            return next
+        self._states[(address, admitted)] = gcra.record(admitted, states[admitted], now)
+        return 0
+
+    async def close(self) -> None:
+        if self.store == "sqlite":
+            from ysubs.utils.sqlite import stop_compaction
+
+            stop_compaction()
+
+    def _sweep(self, now: float) -> None:
+        """Forgets states that have fully recovered, since they are equivalent to an empty state."""
+        self._states = {
+            key: (minute_tat, day_tat)
+            for key, (minute_tat, day_tat) in self._states.items()
+            if minute_tat > now or day_tat > now
+        }
+        self._last_sweep = now
+
+
+def _limits(subscription: "Subscription") -> gcra.Limits:
+    return subscription.plan.requests_per_minute, subscription.plan.requests_per_day
@@ -0,0 +1,91 @@
+from collections import deque
+from time import time
+from typing import TYPE_CHECKING
+
+from brownie.convert.datatypes import EthAddress
+
+from ysubs.backends.base import LimiterBackend, _time_til_next
+from ysubs.utils.time import ONE_DAY, ONE_MINUTE
+
+if TYPE_CHECKING:
+    from ysubs.subscription import Subscription
+
+
+class _History:
+    __slots__ = "minute", "day"
+
+    def __init__(self) -> None:
+        self.minute: deque[float] = deque()
+        self.day: deque[float] = deque()
+
+    def prune(self, now: float) -> None:
+        minute, day = self.minute, self.day
+        while minute and now - minute[0] >= ONE_MINUTE:
+            minute.popleft()
+        while day and now - day[0] >= ONE_DAY:
+            day.popleft()
+
+    def time_til_next(self, subscription: "Subscription", now: float) -> float:
+        plan = subscription.plan
+        return max(
+            _time_til_next(self.minute, plan.requests_per_minute, ONE_MINUTE, now),
+            _time_til_next(self.day, plan.requests_per_day, ONE_DAY, now),
+        )
+
+    def record(self, now: float) -> None:
+        self.minute.append(now)
+        self.day.append(now)
+
+
+class MemoryBackend(LimiterBackend):
+    """
+    Keeps each user's recent request timestamps in process memory.
+
+    Checks never touch the database, but limits are only enforced per process.
+    """
+
+    def __init__(self) -> None:
+        self._histories: dict[EthAddress, _History] = {}
+        self._last_sweep = time()
+
+    async def time_til_next(self, subscription: "Subscription") -> float:
+        now = time()
+        return self._history(subscription.user, now).time_til_next(subscription, now)
+
+    async def record_request(self, address: EthAddress) -> None:
+        now = time()
+        self._history(address, now).record(now)
+
+    async def record_requests(self, address: EthAddress, count: int) -> None:
+        now = time()
+        history = self._history(address, now)
+        for _ in range(count):
+            history.record(now)
+
+    async def check_and_record(self, subscriptions: list["Subscription"]) -> float:
+        # NOTE: There are no awaits in here so the check and the record are atomic.
+        now = time()
+        history = self._history(subscriptions[0].user, now)
+        next = min(history.time_til_next(subscription, now) for subscription in subscriptions)
+        if next > 0:
+            return next
+        history.record(now)
+        return 0
+
+    def _history(self, address: EthAddress, now: float) -> _History:
+        if now - self._last_sweep >= ONE_MINUTE:
+            self._sweep(now)
+        if (history := self._histories.get(address)) is None:
+            history = self._histories[address] = _History()
+        else:
+            history.prune(now)
+        return history
+
+    def _sweep(self, now: float) -> None:
+        """Forgets users who have not made a request within the last day."""
+        self._histories = {
+            address: history
+            for address, history in self._histories.items()
+            if history.day and now - history.day[-1] < ONE_DAY
+        }
+        self._last_sweep = now
@@ -0,0 +1,99 @@
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
+
+from brownie.convert.datatypes import EthAddress
+
+from ysubs.backends.base import LimiterBackend
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+if TYPE_CHECKING:
+    from ysubs.subscription import Subscription
+
+
+# NOTE: Each user has a sorted set of request ids scored by timestamp. We use the server's clock so every node agrees.
+# KEYS: [the user's key]
+# ARGV: [a unique id to record the request under, or "" to only check, then (per minute, per day) limits for each plan]
+# Returns "0" if the request was permitted, otherwise the time until it will be, as a string so Redis doesn't truncate it.
+_CHECK_AND_RECORD = """
+local key = KEYS[1]
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local function time_til_nth_expires(n, window)
+    if n <= 0 then
+        return window
+    end
+    local nth = redis.call('ZREVRANGEBYSCORE', key, '+inf', '(' .. (now - window), 'WITHSCORES', 'LIMIT', n - 1, 1)
+    if #nth == 0 then
+        return 0
+    end
+    return math.max(window - (now - tonumber(nth[2])), 0)
+end
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - 86400)
+local next = nil
+for i = 2, #ARGV, 2 do
+    local wait = math.max(
+        time_til_nth_expires(tonumber(ARGV[i]), 60),
+        time_til_nth_expires(tonumber(ARGV[i + 1]), 86400)
+    )
+    if next == nil or wait < next then
+        next = wait
+    end
+end
+if next ~= nil and next > 0 then
+    return tostring(next)
+end
+if ARGV[1] ~= '' then
+    redis.call('ZADD', key, now, ARGV[1])
+    redis.call('EXPIRE', key, 86400)
+end
+return '0'
+"""
+
+
+class RedisBackend(LimiterBackend):
+    """
+    Stores request history on a server that speaks the Redis protocol, so every worker on every host shares the same limits.
+
+    Each check-and-record runs as a single Lua script, which the server executes atomically.
+    Requires the `redis` package.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        client: Any | None = None,
+        prefix: str = "ysubs:requests:",
+    ) -> None:
+        if client is None:
+            if aioredis is None:
+                raise ImportError("redis is not installed.")
+            client = aioredis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_CHECK_AND_RECORD)
+
+    async def time_til_next(self, subscription: "Subscription") -> float:
+        return await self._run(subscription.user, [subscription], record=False)
+
+    async def record_request(self, address: EthAddress) -> None:
+        await self._run(address, [], record=True)
+
+    async def check_and_record(self, subscriptions: list["Subscription"]) -> float:
+        return await self._run(subscriptions[0].user, subscriptions, record=True)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def _run(
+        self, address: EthAddress, subscriptions: list["Subscription"], record: bool
+    ) -> float:
+        args = [uuid4().hex if record else ""]
+        for subscription in subscriptions:
+            args += subscription.plan.requests_per_minute, subscription.plan.requests_per_day
+        return float(await self._script(keys=[self.prefix + address], args=args))
@@ -0,0 +1,189 @@
+import logging
+from asyncio import Lock, Task, create_task, sleep
+from time import time
+from typing import TYPE_CHECKING, Literal
+
+from brownie.convert.datatypes import EthAddress
+
+from ysubs.backends.base import LimiterBackend
+from ysubs.utils.sqlite import UserRequest, UserRequestBucket, start_compaction, stop_compaction
+from ysubs.utils.time import ONE_MINUTE
+
+if TYPE_CHECKING:
+    from ysubs.subscription import Subscription
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteBackend(LimiterBackend):
+    """
+    Stores request history in the local ysubs database at `_config.DB_PATH`.
+
+    With storage="rows", each request is stored as its own row and windows are exact.
+    With storage="buckets", each user's requests are counted in 'bucket_seconds' wide buckets so a check
+    reads a fixed number of rows regardless of plan size. The minute window then either ignores the oldest,
+    partially expired bucket or, if 'approximate' is True, counts it in proportion to its overlap.
+
+    If 'buffered' is True, admitted requests are held in memory and written in batches every 'flush_interval'
+    seconds or whenever 'flush_size' of them have accumulated. Limit checks still count the unwritten requests,
+    but only those made by this process. Once 'max_pending' requests are waiting to be written, new requests
+    wait for a flush before they are admitted.
+    """
+
+    def __init__(
+        self,
+        storage: Literal["rows", "buckets"] = "rows",
+        bucket_seconds: int = 60,
+        approximate: bool = True,
+        buffered: bool = False,
+        flush_interval: float = 1,
+        flush_size: int = 500,
+        max_pending: int = 10_000,
+    ) -> None:
+        if storage not in ("rows", "buckets"):
+            raise ValueError(f"'storage' must be 'rows' or 'buckets'. You passed {storage}")
+        if not (bucket_seconds > 0 and ONE_MINUTE % bucket_seconds == 0):
+            raise ValueError(
+                f"'bucket_seconds' must be a positive divisor of 60. You passed {bucket_seconds}"
+            )
+        if not flush_size <= max_pending:
+            raise ValueError(
+                f"'flush_size' must not exceed 'max_pending'. You passed {flush_size} and {max_pending}"
+            )
+        self.storage = storage
+        self.bucket_seconds = bucket_seconds
+        self.approximate = approximate
+        self.buffered = buffered
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        self._pending: dict[EthAddress, list[float]] = {}
+        self._pending_count = 0
+        # NOTE: Requests are kept here until their batch is committed so checks never miss them.
+        self._flushing: dict[EthAddress, list[float]] = {}
+        self._flush_lock = Lock()
+        self._user_locks: dict[EthAddress, tuple[Lock, int]] = {}
+        self._flusher: Task | None = None
+        # NOTE: At most one size-triggered flush is scheduled at a time, however many requests arrive meanwhile.
+        self._flush_task: Task | None = None
+
+    async def time_til_next(self, subscription: "Subscription") -> float:
+        limits = [(subscription.plan.requests_per_minute, subscription.plan.requests_per_day)]
+        return await self._check_with_unrecorded(
+            subscription.user, limits, self._unrecorded(subscription.user)
+        )
+
+    async def record_request(self, address: EthAddress) -> None:
+        if self.buffered:
+            self._buffer(address, time())
+        else:
+            await self._record_requests({address: [time()]})
+
+    async def record_requests(self, address: EthAddress, count: int) -> None:
+        now = time()
+        if self.buffered:
+            for _ in range(count):
+                self._buffer(address, now)
+        else:
+            await self._record_requests({address: [now] * count})
+
+    async def check_and_record(self, subscriptions: list["Subscription"]) -> float:
+        limits = [(s.plan.requests_per_minute, s.plan.requests_per_day) for s in subscriptions]
+        address = subscriptions[0].user
+        start_compaction()
+        if not self.buffered:
+            # NOTE: This is a single transaction so limits hold across processes sharing the database.
+            if self.storage == "rows":
+                return await UserRequest.check_and_record(address, limits)
+            return await UserRequestBucket.check_and_record(
+                address, limits, self.bucket_seconds, self.approximate
+            )
+
+        if self._flusher is None:
+            self._flusher = create_task(self._flush_periodically())
+        if self._pending_count >= self.max_pending:
+            await self.flush()
+
+        # NOTE: We hold a per-user lock so concurrent requests from one user can't both take the last slot.
+        lock, users = self._user_locks.get(address, (Lock(), 0))
+        self._user_locks[address] = lock, users + 1
+        try:
+            async with lock:
+                unrecorded = self._unrecorded(address)
+                if next := await self._check_with_unrecorded(address, limits, unrecorded):
+                    return next
+                self._buffer(address, time())
+                return 0
+        finally:
+            lock, users = self._user_locks[address]
+            if users == 1:
+                del self._user_locks[address]
+            else:
+                self._user_locks[address] = lock, users - 1
+
+    async def flush(self) -> None:
+        """Writes all buffered requests to the database."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            self._pending_count = 0
+            try:
+                await self._record_requests(self._flushing)
+            except Exception:
+                # NOTE: Put the requests back so we can try again on the next flush.
+                for address, timestamps in self._pending.items():
+                    self._flushing.setdefault(address, []).extend(timestamps)
+                self._pending = self._flushing
+                self._pending_count = sum(map(len, self._pending.values()))
+                raise
+            finally:
+                self._flushing = {}
+
+    async def close(self) -> None:
+        stop_compaction()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
+
+    async def _check_with_unrecorded(
+        self, address: EthAddress, limits: list[tuple[int, int]], unrecorded: list[float]
+    ) -> float:
+        if self.storage == "rows":
+            return await UserRequest.check_with_unrecorded(address, limits, unrecorded)
+        return await UserRequestBucket.check_with_unrecorded(
+            address, limits, self.bucket_seconds, self.approximate, unrecorded
+        )
+
+    async def _record_requests(self, requests: dict[EthAddress, list[float]]) -> None:
+        if self.storage == "rows":
+            await UserRequest.record_requests(requests)
+        else:
+            await UserRequestBucket.record_requests(requests, self.bucket_seconds)
+
+    def _unrecorded(self, address: EthAddress) -> list[float]:
+        return self._flushing.get(address, []) + self._pending.get(address, [])
+
+    def _buffer(self, address: EthAddress, timestamp: float) -> None:
+        self._pending.setdefault(address, []).append(timestamp)
+        self._pending_count += 1
+        if self._pending_count >= self.flush_size and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            self._flush_task = create_task(self._try_flush())
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await sleep(self.flush_interval)
+            await self._try_flush()
+
+    async def _try_flush(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            # NOTE: The requests are still buffered, we'll try again on the next flush.
+            logger.exception("failed to write buffered requests to the ysubs database")
@@ -30,7 +30,7 @@ class SignatureNotProvided(SignatureError):
 
 class SignatureNotAuthorized(SignatureError):
     def __init__(self, ysubs: "ySubs", signature: str) -> None:
-        f"Signature {signature} does not have an active subscription. Please purchase one at {ysubs.url}"
+        msg = f"Signature {signature} does not have an active subscription. Please purchase one at {ysubs.url}"
         super().__init__(msg)
 
 
@@ -44,6 +44,12 @@ class NoActiveSubscriptions(Exception):
         super().__init__(f"No active subscriptions for {signer}")
 
 
+class SubscriptionLookupTimeout(Exception):
+    def __init__(self, signer: str, timeout: float) -> None:
+        msg = f"Could not look up the subscriptions for {signer} within {timeout} seconds. Please try again shortly."
+        super().__init__(msg)
+
+
 class BadInput(ValueError):
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         # NOTE Sometimes we just pass in an Exception as input here and want to convert it to a string.
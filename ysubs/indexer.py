@@ -0,0 +1,140 @@
+import logging
+from asyncio import Task, create_task, sleep
+from collections.abc import Iterable
+from time import time
+from typing import TYPE_CHECKING, Any
+
+from brownie.convert.datatypes import EthAddress
+from brownie.network.event import _decode_logs
+
+from ysubs import _config
+from ysubs.utils.dank_mids import dank_w3
+from ysubs.utils.sqlite import IndexedSubscription, IndexerCheckpoint
+
+if TYPE_CHECKING:
+    from ysubs.subscriber import Subscriber
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionIndexer:
+    """
+    Follows a Subscriber contract's events into the local ysubs database so active subscriptions can be read without any RPC calls.
+
+    Events are only used to learn which signers were affected. Their subscription ends are then read from the contract,
+    so the indexer doesn't depend on the names or layout of the contract's events. Progress is checkpointed per block range,
+    so a restarted indexer resumes where it left off.
+
+    A fresh index starts at 'start_block', which should be the contract's deployment block. If it's None, we look the
+    deployment block up, which needs a node that serves historical state.
+    """
+
+    def __init__(
+        self,
+        subscriber: "Subscriber",
+        start_block: int | None = None,
+        chunk_size: int = _config.INDEXER_CHUNK_SIZE,
+        poll_interval: float = _config.INDEXER_POLL_INTERVAL,
+        max_lag: float | None = None,
+    ) -> None:
+        """
+        max_lag: for how long, in seconds, the index may go without a successful sync before lookups fall back to the chain. Defaults to INDEXER_MAX_LAG_POLLS poll intervals.
+        """
+        if not chunk_size > 0:
+            raise ValueError(f"'chunk_size' must be a positive integer. You passed {chunk_size}")
+        self.subscriber = subscriber
+        self.address = subscriber.contract.address
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.max_lag = poll_interval * _config.INDEXER_MAX_LAG_POLLS if max_lag is None else max_lag
+        # NOTE: The time of the last sync that reached the head, or None if there hasn't been one yet.
+        self.last_synced_at: float | None = None
+        self._follower: Task | None = None
+
+    @property
+    def synced(self) -> bool:
+        """True if every block up to the head was indexed within the last 'max_lag' seconds."""
+        return self.last_synced_at is not None and time() - self.last_synced_at < self.max_lag
+
+    def start(self) -> None:
+        """Starts following the chain in the background, unless we already are."""
+        if self._follower is None or self._follower.done():
+            self._follower = create_task(self._follow())
+
+    def stop(self) -> None:
+        if self._follower is not None:
+            self._follower.cancel()
+            self._follower = None
+
+    async def sync(self) -> int:
+        """Indexes every block up to the current head and returns the last block indexed."""
+        head = await dank_w3.eth.block_number
+        checkpoint = await IndexerCheckpoint.get_block(self.address)
+        if checkpoint is None:
+            if self.start_block is None:
+                self.start_block = await self._find_deployment_block(head)
+            from_block = self.start_block
+        else:
+            from_block = checkpoint + 1
+        for start in range(from_block, head + 1, self.chunk_size):
+            await self._index_range(start, min(start + self.chunk_size - 1, head))
+        self.last_synced_at = time()
+        return head
+
+    async def active_plan_ids_for(self, signers: list[str]) -> dict[str, tuple[int, ...]]:
+        return await IndexedSubscription.active_plan_ids_for(self.address, signers)
+
+    async def _follow(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception:
+                # NOTE: The checkpoint only moves forward once a range is indexed, so we just try again next time.
+                logger.exception("failed to index subscriptions for %s", self.address)
+            await sleep(self.poll_interval)
+
+    async def _find_deployment_block(self, head: int) -> int:
+        """Returns the first block at which the contract has code, or 0 if the node can't tell us."""
+        try:
+            low, high = 0, head
+            while low < high:
+                mid = (low + high) // 2
+                if await dank_w3.eth.get_code(self.address, mid):
+                    high = mid
+                else:
+                    low = mid + 1
+        except Exception:
+            logger.warning(
+                "could not find the deployment block of %s, indexing from genesis",
+                self.address,
+                exc_info=True,
+            )
+            return 0
+        logger.info("indexing %s from its deployment at block %s", self.address, low)
+        return low
+
+    async def _index_range(self, from_block: int, to_block: int) -> None:
+        logs = await dank_w3.eth.get_logs(
+            {"address": self.address, "fromBlock": from_block, "toBlock": to_block}
+        )
+        events = _decode_logs(logs)
+        signers = set(_addresses_in(value for event in events for value in event.values()))
+        signers.discard(self.address)
+        ends_for = await self.subscriber._fetch_subscription_ends(list(signers)) if signers else {}
+        await IndexedSubscription.index(self.address, ends_for, to_block)
+        logger.debug(
+            "indexed blocks %s to %s for %s, %s signers affected",
+            from_block,
+            to_block,
+            self.address,
+            len(signers),
+        )
+
+
+def _addresses_in(values: Iterable[Any]) -> Iterable[EthAddress]:
+    for value in values:
+        if isinstance(value, EthAddress):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            yield from _addresses_in(value)
@@ -2,6 +2,8 @@ from typing import Final, final
 
 
 class Plan:
+    __slots__ = "name", "price", "requests_per_day", "requests_per_minute", "seconds_per_request"
+
     def __init__(
         self,
         price: int,
@@ -24,6 +26,8 @@ class Plan:
 
 @final
 class FreeTrial(Plan):
+    __slots__ = ()
+
     def __init__(self, rate_limit_per_minute: int) -> None:
         if not rate_limit_per_minute > 0:
             err = f"'rate_limit_per_minute' must be a positive integer. You passed {rate_limit_per_minute}"
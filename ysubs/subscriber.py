@@ -1,5 +1,9 @@
-from asyncio import gather
-from datetime import datetime, timezone
+import logging
+from asyncio import Task, create_task, gather, sleep, to_thread
+from collections.abc import Iterable, Mapping
+from time import perf_counter, time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 import a_sync
 import dank_mids
@@ -9,66 +13,231 @@ from semantic_version import Version
 from ysubs import _config
 from ysubs.plan import Plan
 from ysubs.subscription import Subscription
-from ysubs.utils import dank_mids, sentry
+from ysubs.utils import abi, metrics, sentry
+from ysubs.utils.cache import CacheInfo, TTLCache
+from ysubs.utils.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from ysubs.indexer import SubscriptionIndexer
+
+logger = logging.getLogger(__name__)
+
+
+class PlanCatalog(NamedTuple):
+    """An immutable snapshot of a Subscriber's plans. 'version' increases each time the catalog is reloaded."""
+
+    version: int
+    plans: Mapping[int, Plan]
+    loaded_at: float
 
 
 class Subscriber(a_sync.ASyncGenericBase):
-    def __init__(self, address: ChecksumAddress, asynchronous: bool = False) -> None:
+    def __init__(
+        self,
+        address: ChecksumAddress,
+        asynchronous: bool = False,
+        indexed: bool = False,
+        index_start_block: int | None = None,
+        _contract: "dank_mids.Contract | None" = None,
+    ) -> None:
+        """
+        address: the address of a Subscriber contract you have deployed for your program
+        indexed: if True, follow this contract's events into the local ysubs database and answer lookups from there
+        index_start_block: the block the contract was deployed at, where a fresh index starts. If None, it's looked up from the chain
+        """
         self.asynchronous = asynchronous
-        try:
-            self.contract = dank_mids.Contract(address)
-        except ValueError:
-            self.contract = dank_mids.Contract.from_explorer(address)
+        super().__init__()
+        self.contract = _contract or _load_contract(address)
+        self._catalog: PlanCatalog | None = None
+        self._catalog_loads: SingleFlight[None, PlanCatalog] = SingleFlight()
+        self._catalog_refresher: Task | None = None
+        # NOTE: Maps each signer to the ids of their active plans. Entries expire no later than the earliest subscription end.
+        self._active_plan_ids_for: TTLCache[str, tuple[int, ...]] = TTLCache(
+            _config.SUBSCRIPTION_CACHE_SIZE, _config.SUBSCRIPTION_REFRESH_INTERVAL
+        )
+        self.indexer: "SubscriptionIndexer | None" = None
+        if indexed:
+            # NOTE: Imported here since ysubs.indexer needs a connected node on import.
+            from ysubs import indexer
+
+            self.indexer = indexer.SubscriptionIndexer(self, start_block=index_start_block)
+
+    @classmethod
+    async def create(
+        cls,
+        address: ChecksumAddress,
+        asynchronous: bool = False,
+        indexed: bool = False,
+        index_start_block: int | None = None,
+    ) -> "Subscriber":
+        """Like the constructor, but loads the contract on a thread so many Subscribers can be built at once."""
+        contract = await to_thread(_load_contract, address)
+        return cls(
+            address,
+            asynchronous=asynchronous,
+            indexed=indexed,
+            index_start_block=index_start_block,
+            _contract=contract,
+        )
 
     @a_sync.aka.cached_property
     @sentry.trace
     async def version(self) -> Version:
-        return Version(await self.contract.API_VERSION.coroutine())
+        return Version(await self._call("API_VERSION"))
 
     @a_sync.aka.property
     @sentry.trace
     async def plan_count(self) -> int:
-        return await self.contract.plan_count.coroutine()
+        return await self._call("plan_count")
 
     @a_sync.aka.property
     @sentry.trace
     async def active_plan_ids(self) -> list[int]:
-        return list(range(1, await self.__plan_count__(sync=False) + 1))
+        return list((await self._get_catalog()).plans)
+
+    @a_sync.aka.property
+    async def catalog(self) -> PlanCatalog:
+        return await self._get_catalog()
 
-    @a_sync.a_sync(cache_type="memory")
     @sentry.trace
     async def get_plan(self, plan_id: int) -> Plan | None:
-        if plan_id > 0:
-            details = await self.contract.get_plan.coroutine(plan_id)
-            return Plan(**details.dict())
-        raise ValueError(f"{plan_id} is not a valid plan_id.")
+        if plan_id <= 0:
+            raise ValueError(f"{plan_id} is not a valid plan_id.")
+        if plan := (await self._get_catalog()).plans.get(plan_id):
+            return plan
+        # NOTE: The plan was created after our last refresh.
+        return await self._fetch_plan(plan_id)
 
-    @a_sync.a_sync(ram_cache_ttl=_config.VALIDATION_INTERVAL)
     @sentry.trace
     async def get_all_plans(self) -> list[Plan]:
-        return await gather(
-            *[
-                self.get_plan(plan_id, sync=False)
-                for plan_id in await self.__active_plan_ids__(sync=False)
-            ]
-        )
+        return list((await self._get_catalog()).plans.values())
 
-    @a_sync.a_sync(cache_type="memory")
     @sentry.trace
     async def get_subscription(self, signer: str, plan_id: int) -> Subscription:
-        return Subscription(signer, await self.get_plan(plan_id))
+        return Subscription(signer, await self.get_plan(plan_id, sync=False))
+
+    @sentry.trace
+    async def load_catalog(self) -> PlanCatalog:
+        """Fetches every plan from the chain and replaces the catalog in one step."""
+        plan_count = await self.__plan_count__(sync=False)
+        plan_ids = range(1, plan_count + 1)
+        plans = await gather(*map(self._fetch_plan, plan_ids))
+        version = self._catalog.version + 1 if self._catalog else 1
+        self._catalog = PlanCatalog(version, MappingProxyType(dict(zip(plan_ids, plans))), time())
+        return self._catalog
 
     @sentry.trace
     async def get_active_subscriptions(self, signer: str) -> list[Subscription]:
-        plan_ids = await self.__active_plan_ids__(sync=False)
-        ends = await gather(
-            *[self.contract.subscription_end.coroutine(i, signer) for i in plan_ids]
-        )
-        now = datetime.now(tz=timezone.utc)
-        return await gather(
+        return (await self.get_active_subscriptions_many([signer], sync=False))[signer]
+
+    @sentry.trace
+    async def get_active_subscriptions_many(
+        self, signers: Iterable[str]
+    ) -> dict[str, list[Subscription]]:
+        """
+        Returns active subscriptions for each of 'signers'.
+
+        If this Subscriber is indexed, they are read from the local index in one query once it has caught up to the chain.
+        Otherwise, all uncached lookups are issued together so dank_mids can pack them into a single multicall.
+        """
+        plan_ids_for = await self._get_active_plan_ids_for(signers)
+        subscriptions = await gather(
             *[
-                self.get_subscription(signer, id)
-                for end, id in zip(ends, plan_ids)
-                if end and datetime.fromtimestamp(end, tz=timezone.utc) > now
+                gather(*[self.get_subscription(signer, id, sync=False) for id in plan_ids])
+                for signer, plan_ids in plan_ids_for.items()
             ]
         )
+        return dict(zip(plan_ids_for, subscriptions))
+
+    def close(self) -> None:
+        """Stops refreshing the plan catalog and stops the indexer, if any."""
+        if self._catalog_refresher is not None:
+            self._catalog_refresher.cancel()
+            self._catalog_refresher = None
+        if self.indexer is not None:
+            self.indexer.stop()
+
+    def cache_info(self) -> CacheInfo:
+        """Returns the state of the per-signer active plan cache."""
+        return self._active_plan_ids_for.cache_info()
+
+    async def _get_active_plan_ids_for(self, signers: Iterable[str]) -> dict[str, tuple[int, ...]]:
+        if self.indexer is not None:
+            self.indexer.start()
+            # NOTE: Until the backfill completes the index is missing subscriptions, so we ask the chain instead.
+            if self.indexer.synced:
+                return await self.indexer.active_plan_ids_for(list(signers))
+        plan_ids_for = {signer: self._active_plan_ids_for.get(signer) for signer in signers}
+        if missing := [signer for signer, plan_ids in plan_ids_for.items() if plan_ids is None]:
+            plan_ids_for.update(await self._fetch_active_plan_ids_for(missing))
+        return plan_ids_for
+
+    async def _fetch_active_plan_ids_for(self, signers: list[str]) -> dict[str, tuple[int, ...]]:
+        ends_for = await self._fetch_subscription_ends(signers)
+        now = time()
+        active_plan_ids_for = {}
+        for signer, ends in ends_for.items():
+            active = {id: end for id, end in ends.items() if end > now}
+            if active:
+                ttl = min(min(active.values()) - now, _config.SUBSCRIPTION_REFRESH_INTERVAL)
+            else:
+                ttl = _config.NEGATIVE_SUBSCRIPTION_TTL
+            self._active_plan_ids_for.set(signer, tuple(active), ttl)
+            active_plan_ids_for[signer] = tuple(active)
+        return active_plan_ids_for
+
+    async def _fetch_subscription_ends(self, signers: list[str]) -> dict[str, dict[int, int]]:
+        """Returns the subscription end of each of 'signers' on every plan they have ever subscribed to."""
+        plan_ids = await self.__active_plan_ids__(sync=False)
+        ends = await gather(
+            *[self._call("subscription_end", i, signer) for signer in signers for i in plan_ids]
+        )
+        return {
+            signer: {
+                id: end
+                for id, end in zip(plan_ids, ends[n * len(plan_ids) : (n + 1) * len(plan_ids)])
+                if end
+            }
+            for n, signer in enumerate(signers)
+        }
+
+    async def _get_catalog(self) -> PlanCatalog:
+        if self._catalog is None:
+            await self._catalog_loads.do(None, lambda: self.load_catalog(sync=False))
+        if self._catalog_refresher is None or self._catalog_refresher.done():
+            self._catalog_refresher = create_task(self._refresh_catalog_periodically())
+        return self._catalog
+
+    async def _refresh_catalog_periodically(self) -> None:
+        while True:
+            await sleep(_config.VALIDATION_INTERVAL)
+            try:
+                await self.load_catalog(sync=False)
+            except Exception:
+                # NOTE: We keep serving the previous catalog and try again next interval.
+                logger.exception("failed to refresh the plan catalog for %s", self.contract.address)
+
+    async def _fetch_plan(self, plan_id: int) -> Plan:
+        details = await self._call("get_plan", plan_id)
+        return Plan(**details.dict())
+
+    async def _call(self, method: str, *args: Any) -> Any:
+        start = perf_counter()
+        try:
+            return await getattr(self.contract, method).coroutine(*args)
+        except Exception:
+            metrics.increment("ysubs_rpc_errors_total", method=method)
+            raise
+        finally:
+            metrics.observe("ysubs_rpc_seconds", perf_counter() - start, method=method)
+
+
+def _load_contract(address: ChecksumAddress) -> "dank_mids.Contract":
+    if (cached := abi.load(address)) is not None:
+        return dank_mids.Contract.from_abi("Subscriber", address, cached)
+    try:
+        contract = dank_mids.Contract(address)
+    except ValueError:
+        contract = dank_mids.Contract.from_explorer(address)
+    abi.save(address, contract.abi)
+    return contract
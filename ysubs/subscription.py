@@ -1,11 +1,11 @@
-from asyncio import create_task, gather
-
+from ysubs.backends import LimiterBackend, default_backend
 from ysubs.exceptions import TooManyRequests
 from ysubs.plan import Plan
-from ysubs.utils.sqlite import UserRequest
 
 
 class Subscription:
+    __slots__ = "user", "plan"
+
     def __init__(self, user_wallet: str, plan: Plan) -> None:
         self.user = user_wallet
         self.plan = plan
@@ -14,30 +14,23 @@ class Subscription:
         return f"<Subscription {self.user} {self.plan}>"
 
     async def __aenter__(self):
-        if time_to_next := await UserRequest.next(self):
-            raise TooManyRequests(time_to_next)
-        create_task(UserRequest.record_request(self.user))
+        await SubscriptionsLimiter([self]).__aenter__()
 
     async def __aexit__(self, *_):
         pass
 
 
 class SubscriptionsLimiter:
-    def __init__(self, subscriptions: list[Subscription]) -> None:
+    def __init__(
+        self, subscriptions: list[Subscription], backend: LimiterBackend | None = None
+    ) -> None:
         self.subscriptions = subscriptions
+        self.backend = backend or default_backend()
 
     async def __aenter__(self) -> None:
         """We will enter this object before each request a user makes."""
-        for subscription in self.subscriptions:
-            try:
-                async with subscription:
-                    return
-            except TooManyRequests:
-                pass
-        next = min(await gather(*map(UserRequest.next, self.subscriptions)))
-        if next <= 0:  # potential race condition
-            return
-        raise TooManyRequests(next)
+        if next := await self.backend.check_and_record(self.subscriptions):
+            raise TooManyRequests(next)
 
     async def __aexit__(self, *_) -> None:
         # NOTE: exiting a Subscription does nothing so we don't need to do that here.
@@ -0,0 +1,156 @@
+"""
+Exports per-user request counts from the local ysubs database for billing and analytics.
+
+    ysubs-usage --since 2024-01-01 --window 3600 > usage.csv
+    ysubs-usage --since 1704067200 --until 1704153600 --format jsonl --output usage.jsonl
+
+Requests are only recorded per user, so counts are per user rather than per plan. Request history older than a day
+is pruned by the limiter's compaction, so export it at least that often if you need a complete record.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+from collections.abc import AsyncIterator
+from datetime import datetime, timezone
+from time import time
+from typing import NamedTuple, TextIO
+
+from ysubs import _config
+from ysubs.utils.sqlite import User
+from ysubs.utils.time import ONE_DAY
+
+
+class Usage(NamedTuple):
+    address: str
+    start: float
+    end: float
+    requests: int
+
+
+async def iter_usage(
+    since: float,
+    until: float | None = None,
+    window: int = ONE_DAY,
+    chunk_size: int = _config.USAGE_EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[Usage]:
+    """
+    Yields the number of requests each user made in each 'window' seconds from 'since' until 'until', or now.
+
+    Windows are yielded in chronological order, and users within a window in the order they were first seen.
+    Each query reads at most 'chunk_size' users from one window in its own short read, so memory stays flat and
+    writers are never blocked. Bucketed request counts belong to the window their bucket starts in.
+    """
+    if not window > 0:
+        raise ValueError(f"'window' must be a positive number of seconds. You passed {window}")
+    if not chunk_size > 0:
+        raise ValueError(f"'chunk_size' must be a positive integer. You passed {chunk_size}")
+    if until is None:
+        until = time()
+    start = since
+    while start < until:
+        end = min(start + window, until)
+        after = 0
+        while True:
+            page = await User.usage(start, end, after, chunk_size)
+            for user_id, address, requests in page:
+                yield Usage(address, start, end, requests)
+            if len(page) < chunk_size:
+                break
+            after = page[-1][0]
+        start = end
+
+
+async def export(
+    output: TextIO,
+    format: str,
+    since: float,
+    until: float | None = None,
+    window: int = ONE_DAY,
+    chunk_size: int = _config.USAGE_EXPORT_CHUNK_SIZE,
+) -> int:
+    """Writes usage to the text file 'output' as csv or jsonl and returns the number of rows written."""
+    if format not in ("csv", "jsonl"):
+        raise ValueError(f"'format' must be 'csv' or 'jsonl'. You passed {format}")
+    if format == "csv":
+        writer = csv.writer(output)
+        writer.writerow(Usage._fields)
+    rows = 0
+    async for usage in iter_usage(since, until, window, chunk_size):
+        if format == "csv":
+            writer.writerow(usage)
+        else:
+            output.write(json.dumps(usage._asdict()) + "\n")
+        rows += 1
+    return rows
+
+
+def _timestamp(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"must be a unix timestamp or an ISO 8601 date. You passed {value}"
+        ) from None
+    # NOTE: Dates without a timezone are taken to be UTC so exports don't depend on where they run.
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive integer. You passed {value}")
+    return number
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--since", type=_timestamp, help="a unix timestamp or ISO 8601 date. Defaults to a day ago"
+    )
+    parser.add_argument(
+        "--until", type=_timestamp, help="a unix timestamp or ISO 8601 date. Defaults to now"
+    )
+    parser.add_argument(
+        "--window", type=_positive_int, default=ONE_DAY, help="seconds per usage window"
+    )
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--output", help="write to this file instead of stdout")
+    parser.add_argument("--db", help=f"the ysubs database to read. Defaults to {_config.DB_PATH}")
+    parser.add_argument(
+        "--chunk-size",
+        type=_positive_int,
+        default=_config.USAGE_EXPORT_CHUNK_SIZE,
+        help="users read per query",
+    )
+    args = parser.parse_args()
+    if args.db:
+        # NOTE: The database is bound on first use, so this takes effect as long as nothing has read it yet.
+        _config.DB_PATH = args.db
+    until = time() if args.until is None else args.until
+    since = until - ONE_DAY if args.since is None else args.since
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        asyncio.run(export(output, args.format, since, until, args.window, args.chunk_size))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
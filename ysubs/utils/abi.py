@@ -0,0 +1,39 @@
+import json
+import logging
+import os
+
+from brownie import chain
+
+from ysubs import _config
+
+logger = logging.getLogger(__name__)
+
+
+def load(address: str) -> list[dict] | None:
+    """Returns the cached ABI for the contract at 'address' on the connected chain, if we have one."""
+    try:
+        with open(_path(address)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning("ignoring unreadable cached ABI for %s", address, exc_info=True)
+        return None
+
+
+def save(address: str, abi: list[dict]) -> None:
+    path = _path(address)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # NOTE: We write to a temporary file and rename it so a crash never leaves a truncated ABI behind.
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(abi, f)
+        os.replace(tmp, path)
+    except OSError:
+        # NOTE: The cache only saves time on the next start, so we don't fail if it can't be written.
+        logger.warning("failed to cache the ABI for %s", address, exc_info=True)
+
+
+def _path(address: str) -> str:
+    return os.path.join(_config.ABI_CACHE_DIR, str(chain.id), f"{address}.json")
@@ -0,0 +1,70 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+from time import monotonic
+from typing import Generic, NamedTuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class TTLCache(Generic[K, V]):
+    """A bounded LRU mapping whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        if not maxsize > 0:
+            raise ValueError(f"'maxsize' must be a positive integer. You passed {maxsize}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key, _MISSING, _count=False) is not _MISSING
+
+    def get(self, key: K, default: V | None = None, _count: bool = True) -> V | None:
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            if _count:
+                self.misses += 1
+            return default
+        if expires <= monotonic():
+            del self._data[key]
+            if _count:
+                self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        if _count:
+            self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        self._data[key] = monotonic() + (self.ttl if ttl is None else ttl), value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K, default: V | None = None) -> V | None:
+        try:
+            return self._data.pop(key)[1]
+        except KeyError:
+            return default
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
@@ -0,0 +1,58 @@
+"""
+The Generic Cell Rate Algorithm.
+
+Instead of a request history, we keep a single "theoretical arrival time" (TAT) per limit. Each request pushes
+the TAT forward by `window / limit` seconds, and a request is permitted as long as the TAT would not end up more
+than `window` seconds in the future. This permits bursts of up to `limit` requests and then one request every
+`window / limit` seconds.
+"""
+
+from ysubs.utils.time import ONE_DAY, ONE_MINUTE
+
+# NOTE: (requests per minute, requests per day)
+Limits = tuple[int, int]
+# NOTE: (minute TAT, day TAT)
+State = tuple[float, float]
+
+EMPTY_STATE: State = 0.0, 0.0
+
+
+def time_til_next(tat: float, limit: int, window: float, now: float) -> float:
+    if limit <= 0:
+        return window
+    next = max(tat, now) + window / limit - window - now
+    return next if next > 0 else 0
+
+
+def advance(tat: float, limit: int, window: float, now: float) -> float:
+    return max(tat, now) + window / limit
+
+
+def check(states: dict[Limits, State], now: float) -> tuple[float, Limits | None]:
+    """
+    Returns (0, limits) for the first of 'states' that permits a request now.
+    If none do, returns the time until one will and None.
+    """
+    next = None
+    for limits, (minute_tat, day_tat) in states.items():
+        per_minute, per_day = limits
+        wait = max(
+            time_til_next(minute_tat, per_minute, ONE_MINUTE, now),
+            time_til_next(day_tat, per_day, ONE_DAY, now),
+        )
+        if wait == 0:
+            return 0, limits
+        if next is None or wait < next:
+            next = wait
+    return next, None
+
+
+def record(limits: Limits, state: State, now: float) -> State:
+    per_minute, per_day = limits
+    minute_tat, day_tat = state
+    return advance(minute_tat, per_minute, ONE_MINUTE, now), advance(day_tat, per_day, ONE_DAY, now)
+
+
+def tightest(limits: list[Limits]) -> Limits:
+    """Returns the limits that permit the fewest requests per day, then per minute."""
+    return min(limits, key=lambda limits: (limits[1], limits[0]))
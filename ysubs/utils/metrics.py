@@ -0,0 +1,147 @@
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Sequence
+
+# NOTE: Labels are stored as sorted (name, value) pairs so the same labels always produce the same key.
+Labels = tuple[tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+
+class Metrics:
+    """
+    The interface ysubs reports metrics to. This default discards everything, so instrumentation costs only a call.
+
+    Subclass it to forward metrics to your own system, then pass an instance to `use`.
+    """
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Adds 'value' to the counter 'name'."""
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Records 'value' in the histogram 'name'."""
+
+    def gauge(self, name: str, value: float, **labels: str) -> None:
+        """Sets the gauge 'name' to 'value'."""
+
+
+class PrometheusMetrics(Metrics):
+    """Keeps counters, gauges and histograms in memory and renders them in the Prometheus text format."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        # NOTE: Database calls report from executor threads, so every update takes this lock.
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._gauges: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, tuple[list[int], list[float]]]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {})
+            if key not in histogram:
+                # NOTE: The last bucket is +Inf. The second list holds the running sum.
+                histogram[key] = [0] * (len(self.buckets) + 1), [0.0]
+            counts, total = histogram[key]
+            counts[bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def gauge(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def render(self) -> str:
+        """Runs every registered collector, then returns all metrics in the Prometheus text exposition format."""
+        for collector in list(_collectors):
+            collector()
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, values in sorted(metrics.items()):
+                    lines.append(f"# TYPE {name} {kind}")
+                    lines.extend(f"{name}{_format(key)} {value}" for key, value in values.items())
+            for name, histograms in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, (counts, total) in histograms.items():
+                    cumulative = 0
+                    for le, count in zip((*self.buckets, "+Inf"), counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format(key, le=le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format(key)} {total[0]}")
+                    lines.append(f"{name}_count{_format(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+_collectors: list[Callable[[], None]] = []
+
+
+def use(metrics: Metrics) -> None:
+    """Sends all ysubs metrics to 'metrics' from now on."""
+    global _metrics
+    if not isinstance(metrics, Metrics):
+        raise TypeError(f"'metrics' must be an instance of Metrics. You passed {metrics}")
+    _metrics = metrics
+
+
+def get() -> Metrics:
+    return _metrics
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    _metrics.increment(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    _metrics.observe(name, value, **labels)
+
+
+def gauge(name: str, value: float, **labels: str) -> None:
+    _metrics.gauge(name, value, **labels)
+
+
+def register_collector(collector: Callable[[], None]) -> None:
+    """Registers a callable that reports point-in-time values, like cache sizes, whenever metrics are rendered."""
+    _collectors.append(collector)
+
+
+def unregister_collector(collector: Callable[[], None]) -> None:
+    """Stops calling 'collector' when metrics are rendered. Does nothing if it isn't registered."""
+    if collector in _collectors:
+        _collectors.remove(collector)
+
+
+def _format(key: Labels, **extra: object) -> str:
+    labels = [*key, *extra.items()]
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,20 +1,159 @@
 import binascii
+from asyncio import Future, get_event_loop
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Literal
 
+import eth_keys.exceptions
 import eth_keys.validation
 from brownie.convert.datatypes import EthAddress
 from eth_account import Account
+from eth_account.messages import _hash_eip191_message
+from eth_utils import keccak, to_checksum_address
+from hexbytes import HexBytes
 
 from ysubs import _config
 from ysubs.exceptions import MalformedSignature, SignatureInvalid
 from ysubs.utils import sentry
+from ysubs.utils.cache import CacheInfo, TTLCache
+
+try:
+    import coincurve
+except ImportError:
+    coincurve = None
+
+ExecutorSpec = Executor | Literal["thread", "process"]
+
+_MESSAGE_HASH = _hash_eip191_message(_config.UNSIGNED_MESSAGE)
+
+# NOTE: Successful and failed verifications live in separate caches so a flood of bad signatures can't evict the good ones.
+_verified: TTLCache[tuple[str, str], bool] = TTLCache(
+    _config.SIGNATURE_CACHE_SIZE, _config.VALIDATION_INTERVAL
+)
+_rejected: TTLCache[tuple[str, str], Exception] = TTLCache(
+    _config.SIGNATURE_CACHE_SIZE, _config.VALIDATION_INTERVAL
+)
 
 
 @sentry.trace
 def validate_signer_with_signature(signer: EthAddress, signature: str) -> None:
+    if _is_cached(signer, signature):
+        return
     try:
-        if signer == Account.recover_message(_config.UNSIGNED_MESSAGE, signature=signature):
+        recovered = _recover(signature)
+    except MalformedSignature as e:
+        _rejected.set((signer, signature), e)
+        raise
+    _check(signer, signature, recovered)
+
+
+def cache_info() -> dict[str, CacheInfo]:
+    return {"verified": _verified.cache_info(), "rejected": _rejected.cache_info()}
+
+
+class SignatureValidator:
+    """
+    Validates signatures without blocking the event loop.
+
+    Recoveries requested during the same loop iteration are batched into a single executor task.
+    If no executor is provided, recovery runs inline just like `validate_signer_with_signature`.
+    """
+
+    def __init__(self, executor: ExecutorSpec | None = None) -> None:
+        # NOTE: We only shut down executors we created, the caller manages any they passed in.
+        self._owns_executor = executor in ("thread", "process")
+        if executor == "thread":
+            executor = ThreadPoolExecutor(thread_name_prefix="ysubs-signatures")
+        elif executor == "process":
+            executor = ProcessPoolExecutor()
+        elif executor is not None and not isinstance(executor, Executor):
+            raise TypeError(
+                f"'executor' must be an Executor, 'thread', 'process', or 'None'. You passed {executor}"
+            )
+        self.executor = executor
+        self._pending: dict[str, Future] = {}
+
+    def close(self) -> None:
+        """Shuts down the executor if this validator created it."""
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+    @sentry.trace
+    async def validate(self, signer: EthAddress, signature: str) -> None:
+        if self.executor is None:
+            return validate_signer_with_signature(signer, signature)
+        if _is_cached(signer, signature):
             return
-        raise SignatureInvalid(signer, signature)
+        recovered = await self._recover_in_executor(signature)
+        if isinstance(recovered, MalformedSignature):
+            _rejected.set((signer, signature), recovered)
+            raise recovered
+        _check(signer, signature, recovered)
+
+    def _recover_in_executor(self, signature: str) -> "Future[str | MalformedSignature]":
+        if signature in self._pending:
+            return self._pending[signature]
+        loop = get_event_loop()
+        if not self._pending:
+            loop.call_soon(self._submit_batch)
+        fut = self._pending[signature] = loop.create_future()
+        return fut
+
+    def _submit_batch(self) -> None:
+        batch, self._pending = self._pending, {}
+        loop = get_event_loop()
+        task = loop.run_in_executor(self.executor, _recover_many, list(batch))
+
+        def set_results(task: Future) -> None:
+            if e := task.exception():
+                for fut in batch.values():
+                    if not fut.done():
+                        fut.set_exception(e)
+                return
+            for fut, recovered in zip(batch.values(), task.result()):
+                if not fut.done():
+                    fut.set_result(recovered)
+
+        task.add_done_callback(set_results)
+
+
+def _is_cached(signer: EthAddress, signature: str) -> bool:
+    key = signer, signature
+    if _verified.get(key):
+        return True
+    if (e := _rejected.get(key)) is not None:
+        raise e.with_traceback(None)
+    return False
+
+
+def _check(signer: EthAddress, signature: str, recovered: str) -> None:
+    if signer == recovered:
+        _verified.set((signer, signature), True)
+        return
+    e = SignatureInvalid(signer, signature)
+    _rejected.set((signer, signature), e)
+    raise e
+
+
+def _recover_many(signatures: list[str]) -> list[str | MalformedSignature]:
+    # NOTE: This runs inside the executor, so errors are returned rather than raised to keep the rest of the batch intact.
+    results = []
+    for signature in signatures:
+        try:
+            results.append(_recover(signature))
+        except MalformedSignature as e:
+            results.append(e)
+    return results
+
+
+def _recover(signature: str) -> str:
+    if coincurve is not None:
+        try:
+            return _recover_with_coincurve(signature)
+        except Exception:
+            # NOTE: We fall back to eth_account so malformed input produces the usual error messages.
+            pass
+    try:
+        return Account.recover_message(_config.UNSIGNED_MESSAGE, signature=signature)
     except binascii.Error as e:
         raise MalformedSignature(e)
     except eth_keys.validation.ValidationError as e:
@@ -23,3 +162,22 @@ def validate_signer_with_signature(signer: EthAddress, signature: str) -> None:
                 f"The signature you provided does not have the correct length."
             )
         raise MalformedSignature(e)
+    except eth_keys.exceptions.BadSignature as e:
+        # NOTE: The signature is well formed but no public key can be recovered from it, e.g. if it's all zeros.
+        raise MalformedSignature(e)
+    except ValueError as e:
+        # NOTE: eth_account raises a plain ValueError for an invalid `v` byte.
+        raise MalformedSignature(e)
+
+
+def _recover_with_coincurve(signature: str) -> str:
+    signature = bytes(HexBytes(signature))
+    if len(signature) != 65:
+        raise ValueError("signature must be 65 bytes")
+    v = signature[64]
+    if v >= 27:
+        v -= 27
+    public_key = coincurve.PublicKey.from_signature_and_message(
+        signature[:64] + bytes([v]), _MESSAGE_HASH, hasher=None
+    )
+    return to_checksum_address(keccak(public_key.format(compressed=False)[1:])[-20:])
@@ -0,0 +1,32 @@
+import logging
+from asyncio import Future, ensure_future, shield
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight(Generic[K, T]):
+    """Lets concurrent callers with the same key share one in-flight call instead of each making their own."""
+
+    def __init__(self) -> None:
+        self._calls: dict[K, Future[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[T]]) -> T:
+        if (fut := self._calls.get(key)) is None:
+            fut = self._calls[key] = ensure_future(fn())
+            fut.add_done_callback(lambda fut: self._done(key, fut))
+        # NOTE: We shield the call so one caller being cancelled doesn't cancel it for everyone else.
+        return await shield(fut)
+
+    def _done(self, key: K, fut: Future[T]) -> None:
+        self._calls.pop(key, None)
+        # NOTE: If every caller stopped waiting, nobody is left to raise the exception to, so we log it instead.
+        if not fut.cancelled() and (e := fut.exception()) is not None:
+            logger.debug("single-flight call for %s failed: %r", key, e)
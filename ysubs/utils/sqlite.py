@@ -1,19 +1,123 @@
-from asyncio import gather, get_event_loop
-from time import time
-from typing import TYPE_CHECKING, Literal
+import logging
+import threading
+from asyncio import Task, create_task, gather, get_event_loop, sleep
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Literal, TypeVar
 
 from brownie.convert.datatypes import EthAddress
-from pony.orm import Database, PrimaryKey, Required, Set, db_session, select
+from pony.orm import Database, PrimaryKey, Required, Set, db_session, flush, select
+from typing_extensions import ParamSpec
 
 from ysubs import _config
+from ysubs.utils import gcra, metrics
 from ysubs.utils.time import ONE_DAY, ONE_MINUTE
 
 if TYPE_CHECKING:
     from ysubs.subscription import Subscription
 
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
 db = Database()
 
 
+@db.on_connect(provider="sqlite")
+def _configure_connection(db: Database, connection) -> None:
+    cursor = connection.cursor()
+    # NOTE: This only takes effect when the database is created, so it must come first.
+    #       It lets us reclaim space without a full VACUUM.
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # NOTE: WAL lets readers proceed while a write is in progress. NORMAL sync is still safe in WAL mode.
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute("PRAGMA busy_timeout = 5000")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.execute("PRAGMA cache_size = -16000")
+
+
+class DBExecutor:
+    """
+    Runs database calls on threads owned by ysubs so they don't compete with the default executor.
+
+    Writes run on a single thread, since SQLite only permits one writer at a time anyway, and reads run on a pool.
+    Pony keeps one connection per thread, so each of these threads reuses its connection for its whole life.
+    """
+
+    def __init__(self, reader_threads: int) -> None:
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="ysubs-db-writer")
+        self._readers = ThreadPoolExecutor(reader_threads, thread_name_prefix="ysubs-db-reader")
+        self._lock = threading.Lock()
+        self._queued = {"read": 0, "write": 0}
+
+    async def read(self, fn: Callable[P, T], *args: P.args) -> T:
+        return await self._run(self._readers, "read", fn, *args)
+
+    async def write(self, fn: Callable[P, T], *args: P.args) -> T:
+        return await self._run(self._writer, "write", fn, *args)
+
+    def queue_depth(self) -> dict[str, int]:
+        """Returns the number of reads and writes waiting for a thread."""
+        with self._lock:
+            return dict(self._queued)
+
+    async def _run(
+        self, pool: ThreadPoolExecutor, kind: str, fn: Callable[P, T], *args: P.args
+    ) -> T:
+        def run() -> T:
+            started = perf_counter()
+            with self._lock:
+                self._queued[kind] -= 1
+            if not _bound:
+                bind()
+            metrics.observe("ysubs_db_queue_wait_seconds", started - submitted, kind=kind)
+            try:
+                return fn(*args)
+            finally:
+                metrics.observe(
+                    "ysubs_db_query_seconds", perf_counter() - started, kind=kind, query=fn.__name__
+                )
+
+        with self._lock:
+            self._queued[kind] += 1
+        submitted = perf_counter()
+        return await get_event_loop().run_in_executor(pool, run)
+
+    def _collect_metrics(self) -> None:
+        for kind, depth in self.queue_depth().items():
+            metrics.gauge("ysubs_db_queue_depth", depth, kind=kind)
+
+
+executor = DBExecutor(_config.DB_READER_THREADS)
+metrics.register_collector(executor._collect_metrics)
+
+_bind_lock = threading.Lock()
+_bound = False
+
+
+def bind() -> None:
+    """
+    Binds the database at `_config.DB_PATH` and creates any missing tables and indexes.
+
+    This happens on the executor's threads the first time the database is used, so importing ysubs does no I/O.
+    """
+    global _bound
+    with _bind_lock:
+        if _bound:
+            return
+        db.bind(provider="sqlite", filename=_config.DB_PATH, create_db=True)
+        db.generate_mapping(create_tables=True)
+        # NOTE: Pony can't include float columns in a composite index, so we create this one ourselves.
+        with db_session:
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_user_requests__user_timestamp ON user_requests (user, timestamp)"
+            )
+        _bound = True
+
+
 @db_session
 def _get_or_create_user(address: EthAddress) -> "User":
     user = User.get(address=address)
@@ -27,20 +131,77 @@ def _get_user_id(address: EthAddress) -> int:
     return _get_or_create_user(address).user_id
 
 
+@db_session
+def _recently_active_addresses(since: float, limit: int) -> list[str]:
+    # NOTE: Depending on the backend, a user's requests are stored as rows or as buckets, so we look at both.
+    return [
+        address
+        for (address,) in db.get_connection().execute(
+            "SELECT users.address FROM users JOIN ("
+            " SELECT user, MAX(timestamp) AS last FROM user_requests WHERE timestamp > :since GROUP BY user"
+            " UNION ALL"
+            " SELECT user, MAX(start) AS last FROM user_request_buckets WHERE start > :since GROUP BY user"
+            ") AS activity ON activity.user = users.user_id "
+            "GROUP BY users.user_id ORDER BY MAX(activity.last) DESC LIMIT :limit",
+            {"since": since, "limit": limit},
+        )
+    ]
+
+
+@db_session
+def _usage_page(start: float, end: float, after: int, limit: int) -> list[tuple[int, str, int]]:
+    # NOTE: Both tables are keyed by user first, so each branch walks its index in user order and stops after 'limit'
+    #       users. Any user among the first 'limit' overall is among the first 'limit' of every branch they appear in.
+    #       Buckets count toward the window their start falls in.
+    return list(
+        db.get_connection().execute(
+            "SELECT users.user_id, users.address, SUM(usage.requests) FROM users JOIN ("
+            " SELECT * FROM ("
+            "  SELECT user, COUNT(*) AS requests FROM user_requests"
+            "  WHERE user > :after AND timestamp >= :start AND timestamp < :end"
+            "  GROUP BY user ORDER BY user LIMIT :limit"
+            " )"
+            " UNION ALL"
+            " SELECT * FROM ("
+            "  SELECT user, SUM(count) AS requests FROM user_request_buckets"
+            "  WHERE user > :after AND start >= :start AND start < :end"
+            "  GROUP BY user ORDER BY user LIMIT :limit"
+            " )"
+            ") AS usage ON usage.user = users.user_id "
+            "GROUP BY users.user_id ORDER BY users.user_id LIMIT :limit",
+            {"start": start, "end": end, "after": after, "limit": limit},
+        )
+    )
+
+
 class User(db.Entity):
     _table_ = "users"
 
     user_id = PrimaryKey(int, auto=True)
     address = Required(str, unique=True)
     requests = Set("UserRequest")
+    request_buckets = Set("UserRequestBucket")
+    limiter_states = Set("UserLimiterState")
 
     @classmethod
     async def get_or_create_entity(cls, address: EthAddress) -> "User":
-        return await get_event_loop().run_in_executor(None, _get_or_create_user, address)
+        return await executor.write(_get_or_create_user, address)
 
     @classmethod
     async def get_user_id(cls, address: EthAddress) -> int:
-        return await get_event_loop().run_in_executor(None, _get_user_id, address)
+        return await executor.write(_get_user_id, address)
+
+    @classmethod
+    async def recently_active(cls, since: float, limit: int) -> list[str]:
+        """Returns the addresses of up to 'limit' users who made requests after 'since', most recent first."""
+        return await executor.read(_recently_active_addresses, since, limit)
+
+    @classmethod
+    async def usage(
+        cls, start: float, end: float, after: int, limit: int
+    ) -> list[tuple[int, str, int]]:
+        """Returns (user_id, address, requests) for up to 'limit' users after user_id 'after' with requests from 'start' until 'end'."""
+        return await executor.read(_usage_page, start, end, after, limit)
 
 
 @db_session
@@ -65,9 +226,10 @@ def _time_til_next(subscription: "Subscription", limiter: Literal["minute", "day
         ).min()
         next = 0 if least_recent is None else ONE_MINUTE - (t - least_recent)
     elif limiter == "day":
-        _clear_stale_for(subscription.user)
         least_recent = select(
-            r.timestamp for r in UserRequest if r.user.address == subscription.user
+            r.timestamp
+            for r in UserRequest
+            if r.user.address == subscription.user and t - r.timestamp < ONE_DAY
         ).min()
         next = 0 if least_recent is None else ONE_DAY - (t - least_recent)
     else:
@@ -77,8 +239,9 @@ def _time_til_next(subscription: "Subscription", limiter: Literal["minute", "day
 
 @db_session
 def _count_this_day(address: EthAddress) -> int:
-    _clear_stale_for(address)
-    return select(r for r in UserRequest if r.user.address == address).count()
+    return select(
+        r for r in UserRequest if r.user.address == address and time() - r.timestamp < ONE_DAY
+    ).count()
 
 
 @db_session
@@ -93,6 +256,87 @@ def _record_request(address: EthAddress) -> None:
     UserRequest(user=_get_or_create_user(address), timestamp=time())
 
 
+@db_session(immediate=True)
+def _check_and_record(address: EthAddress, limits: list[tuple[int, int]]) -> float:
+    """
+    'limits' is a list of (requests per minute, requests per day) pairs, one for each of the user's plans.
+
+    We take a write lock before reading so concurrent workers can't both admit the last allowed request.
+    """
+    t = time()
+    user = _get_or_create_user(address)
+    next = _time_til_next_for(user, limits, t)
+    if next > 0:
+        return next
+    UserRequest(user=user, timestamp=t)
+    return 0
+
+
+@db_session
+def _check_with_unrecorded(
+    address: EthAddress, limits: list[tuple[int, int]], unrecorded: list[float]
+) -> float:
+    """Like `_check_and_record`, but read-only. 'unrecorded' holds timestamps that have not been written to the db yet."""
+    t = time()
+    return _time_til_next_for(User.get(address=address), limits, t, unrecorded)
+
+
+@db_session(immediate=True)
+def _record_requests(requests: dict[EthAddress, list[float]]) -> None:
+    users = {address: _get_or_create_user(address) for address in requests}
+    # NOTE: We must flush so newly created users are assigned a user_id.
+    flush()
+    rows = [
+        (users[address].user_id, timestamp)
+        for address, timestamps in requests.items()
+        for timestamp in timestamps
+    ]
+    db.get_connection().executemany(
+        "INSERT INTO user_requests (user, timestamp) VALUES (?, ?)", rows
+    )
+
+
+def _time_til_next_for(
+    user: User | None,
+    limits: list[tuple[int, int]],
+    t: float,
+    unrecorded: Sequence[float] = (),
+) -> float:
+    return min(
+        max(
+            _time_til_nth_expires(user, per_minute, ONE_MINUTE, t, unrecorded),
+            _time_til_nth_expires(user, per_day, ONE_DAY, t, unrecorded),
+        )
+        for per_minute, per_day in set(limits)
+    )
+
+
+def _time_til_nth_expires(
+    user: User | None, n: int, window: int, t: float, unrecorded: Sequence[float] = ()
+) -> float:
+    """Returns the time until the user's 'n'th most recent request falls out of 'window', or 0 if they haven't made 'n' requests within it."""
+    if n <= 0:
+        # NOTE: A limit of 0 never permits a request, like the bucketed and GCRA limiters.
+        return window
+    # NOTE: Unrecorded requests are always more recent than the recorded ones.
+    unrecorded = [timestamp for timestamp in unrecorded if t - timestamp < window]
+    if len(unrecorded) >= n:
+        nth_most_recent = unrecorded[-n]
+    elif user is None:
+        return 0
+    else:
+        query = (
+            select(r.timestamp for r in UserRequest if r.user == user and t - r.timestamp < window)
+            .order_by(-1)
+            .limit(1, offset=n - len(unrecorded) - 1)
+        )
+        if not query:
+            return 0
+        nth_most_recent = query[0]
+    next = window - (t - nth_most_recent)
+    return next if next > 0 else 0
+
+
 class UserRequest(db.Entity):
     _table_ = "user_requests"
 
@@ -102,15 +346,15 @@ class UserRequest(db.Entity):
 
     @classmethod
     async def clear_stale_for(cls, address: EthAddress, t: float | None = None) -> None:
-        return await get_event_loop().run_in_executor(None, _clear_stale_for, address, t)
+        return await executor.write(_clear_stale_for, address, t)
 
     @classmethod
     async def count_this_day(cls, address: EthAddress) -> int:
-        return await get_event_loop().run_in_executor(None, _count_this_day, address)
+        return await executor.read(_count_this_day, address)
 
     @classmethod
     async def count_this_minute(cls, address: EthAddress) -> int:
-        return await get_event_loop().run_in_executor(None, _count_this_minute, address)
+        return await executor.read(_count_this_minute, address)
 
     @classmethod
     async def next(cls, subscription: "Subscription") -> int:
@@ -123,14 +367,440 @@ class UserRequest(db.Entity):
 
     @classmethod
     async def record_request(cls, address: EthAddress) -> None:
-        return await get_event_loop().run_in_executor(None, _record_request, address)
+        return await executor.write(_record_request, address)
+
+    @classmethod
+    async def check_and_record(cls, address: EthAddress, limits: list[tuple[int, int]]) -> float:
+        return await executor.write(_check_and_record, address, limits)
+
+    @classmethod
+    async def check_with_unrecorded(
+        cls, address: EthAddress, limits: list[tuple[int, int]], unrecorded: list[float]
+    ) -> float:
+        return await executor.read(_check_with_unrecorded, address, limits, unrecorded)
+
+    @classmethod
+    async def record_requests(cls, requests: dict[EthAddress, list[float]]) -> None:
+        return await executor.write(_record_requests, requests)
 
     @classmethod
     async def _time_til_next(
         cls, subscription: "Subscription", limiter: Literal["minute", "day"]
     ) -> float:
-        return await get_event_loop().run_in_executor(None, _time_til_next, subscription, limiter)
+        return await executor.read(_time_til_next, subscription, limiter)
+
+
+def _bucket_start(timestamp: float, bucket_seconds: int) -> int:
+    return int(timestamp // bucket_seconds * bucket_seconds)
+
+
+def _get_buckets(
+    user: User | None, bucket_seconds: int, t: float, unrecorded: Sequence[float] = ()
+) -> list[tuple[int, int]]:
+    """Returns the user's (start, count) buckets that overlap the last day, oldest first."""
+    counts: dict[int, int] = {}
+    if user is not None:
+        counts.update(
+            select(
+                (b.start, b.count)
+                for b in UserRequestBucket
+                if b.user == user and b.start > t - ONE_DAY - bucket_seconds
+            )
+        )
+    for timestamp in unrecorded:
+        start = _bucket_start(timestamp, bucket_seconds)
+        counts[start] = counts.get(start, 0) + 1
+    return sorted(counts.items())
+
+
+def _time_til_under(
+    buckets: list[tuple[int, int]],
+    limit: int,
+    window: int,
+    bucket_seconds: int,
+    t: float,
+    approximate: bool,
+) -> float:
+    """
+    Returns the time until fewer than 'limit' requests fall within 'window', or 0 if that's already the case.
+
+    A bucket that straddles the start of the window counts in proportion to its overlap if 'approximate' is True,
+    and not at all otherwise. Either way, we wait for whole buckets to expire, so the result errs on the long side.
+    """
+    window_start = t - window
+    weighted = []
+    for start, count in buckets:
+        if start >= window_start:
+            weighted.append((start, count))
+        elif approximate and (overlap := start + bucket_seconds - window_start) > 0:
+            weighted.append((start, count * overlap / bucket_seconds))
+    excess = sum(count for _, count in weighted) - limit + 1
+    if excess <= 0:
+        return 0
+    for start, count in weighted:
+        excess -= count
+        if excess <= 0:
+            next = start + bucket_seconds + window - t
+            return next if next > 0 else 0
+    # NOTE: We only get here if 'limit' is 0, in which case no request will ever be permitted.
+    return window
+
+
+def _bucketed_time_til_next_for(
+    user: User | None,
+    limits: list[tuple[int, int]],
+    bucket_seconds: int,
+    approximate: bool,
+    t: float,
+    unrecorded: Sequence[float] = (),
+) -> float:
+    buckets = _get_buckets(user, bucket_seconds, t, unrecorded)
+    return min(
+        max(
+            _time_til_under(buckets, per_minute, ONE_MINUTE, bucket_seconds, t, approximate),
+            _time_til_under(buckets, per_day, ONE_DAY, bucket_seconds, t, approximate),
+        )
+        for per_minute, per_day in set(limits)
+    )
+
+
+@db_session(immediate=True)
+def _bucketed_check_and_record(
+    address: EthAddress, limits: list[tuple[int, int]], bucket_seconds: int, approximate: bool
+) -> float:
+    t = time()
+    user = _get_or_create_user(address)
+    next = _bucketed_time_til_next_for(user, limits, bucket_seconds, approximate, t)
+    if next > 0:
+        return next
+    start = _bucket_start(t, bucket_seconds)
+    if bucket := UserRequestBucket.get(user=user, start=start):
+        bucket.count += 1
+    else:
+        UserRequestBucket(user=user, start=start, count=1)
+    return 0
+
+
+@db_session
+def _bucketed_check_with_unrecorded(
+    address: EthAddress,
+    limits: list[tuple[int, int]],
+    bucket_seconds: int,
+    approximate: bool,
+    unrecorded: list[float],
+) -> float:
+    t = time()
+    user = User.get(address=address)
+    return _bucketed_time_til_next_for(user, limits, bucket_seconds, approximate, t, unrecorded)
+
+
+@db_session(immediate=True)
+def _bucketed_record_requests(requests: dict[EthAddress, list[float]], bucket_seconds: int) -> None:
+    users = {address: _get_or_create_user(address) for address in requests}
+    # NOTE: We must flush so newly created users are assigned a user_id.
+    flush()
+    counts: dict[tuple[int, int], int] = {}
+    for address, timestamps in requests.items():
+        for timestamp in timestamps:
+            key = users[address].user_id, _bucket_start(timestamp, bucket_seconds)
+            counts[key] = counts.get(key, 0) + 1
+    db.get_connection().executemany(
+        "INSERT INTO user_request_buckets (user, start, count) VALUES (?, ?, ?) "
+        "ON CONFLICT (user, start) DO UPDATE SET count = count + excluded.count",
+        [(user_id, start, count) for (user_id, start), count in counts.items()],
+    )
+
+
+class UserRequestBucket(db.Entity):
+    """Counts a user's requests per 'bucket_seconds' interval, so checks cost the same no matter how busy the user is."""
+
+    _table_ = "user_request_buckets"
+
+    user = Required(User, reverse="request_buckets")
+    start = Required(int)
+    count = Required(int)
+    PrimaryKey(user, start)
+
+    @classmethod
+    async def check_and_record(
+        cls,
+        address: EthAddress,
+        limits: list[tuple[int, int]],
+        bucket_seconds: int,
+        approximate: bool,
+    ) -> float:
+        return await executor.write(
+            _bucketed_check_and_record, address, limits, bucket_seconds, approximate
+        )
+
+    @classmethod
+    async def check_with_unrecorded(
+        cls,
+        address: EthAddress,
+        limits: list[tuple[int, int]],
+        bucket_seconds: int,
+        approximate: bool,
+        unrecorded: list[float],
+    ) -> float:
+        return await executor.read(
+            _bucketed_check_with_unrecorded,
+            address,
+            limits,
+            bucket_seconds,
+            approximate,
+            unrecorded,
+        )
+
+    @classmethod
+    async def record_requests(
+        cls, requests: dict[EthAddress, list[float]], bucket_seconds: int
+    ) -> None:
+        return await executor.write(_bucketed_record_requests, requests, bucket_seconds)
+
+
+@db_session(immediate=True)
+def _gcra_check_and_record(address: EthAddress, limits: list[gcra.Limits]) -> float:
+    t = time()
+    user = _get_or_create_user(address)
+    states = {
+        (per_minute, per_day): UserLimiterState.get(
+            user=user, requests_per_minute=per_minute, requests_per_day=per_day
+        )
+        for per_minute, per_day in limits
+    }
+    next, admitted = gcra.check(
+        {
+            limits: (s.minute_tat, s.day_tat) if s else gcra.EMPTY_STATE
+            for limits, s in states.items()
+        },
+        t,
+    )
+    if admitted is None:
+        return next
+    per_minute, per_day = admitted
+    if (state := states[admitted]) is None:
+        state = UserLimiterState(
+            user=user, requests_per_minute=per_minute, requests_per_day=per_day
+        )
+    state.minute_tat, state.day_tat = gcra.record(admitted, (state.minute_tat, state.day_tat), t)
+    return 0
+
+
+@db_session
+def _gcra_time_til_next(address: EthAddress, limits: gcra.Limits) -> float:
+    state = None
+    # NOTE: A user we've never seen has no state, which is the same as an empty one.
+    if user := User.get(address=address):
+        state = UserLimiterState.get(
+            user=user, requests_per_minute=limits[0], requests_per_day=limits[1]
+        )
+    return gcra.check(
+        {limits: (state.minute_tat, state.day_tat) if state else gcra.EMPTY_STATE}, time()
+    )[0]
+
+
+@db_session(immediate=True)
+def _gcra_record_request(address: EthAddress) -> None:
+    if (user := User.get(address=address)) is None:
+        return
+    states = {(s.requests_per_minute, s.requests_per_day): s for s in user.limiter_states}
+    if not states:
+        return
+    limits = gcra.tightest(list(states))
+    state = states[limits]
+    state.minute_tat, state.day_tat = gcra.record(limits, (state.minute_tat, state.day_tat), time())
+
+
+class UserLimiterState(db.Entity):
+    """Holds GCRA state for one user on one plan. Plans are identified by their limits."""
+
+    _table_ = "user_limiter_states"
+
+    user = Required(User, reverse="limiter_states")
+    requests_per_minute = Required(int)
+    requests_per_day = Required(int)
+    minute_tat = Required(float, default=0)
+    day_tat = Required(float, default=0)
+    PrimaryKey(user, requests_per_minute, requests_per_day)
+
+    @classmethod
+    async def check_and_record(cls, address: EthAddress, limits: list[gcra.Limits]) -> float:
+        return await executor.write(_gcra_check_and_record, address, limits)
+
+    @classmethod
+    async def time_til_next(cls, address: EthAddress, limits: gcra.Limits) -> float:
+        return await executor.read(_gcra_time_til_next, address, limits)
+
+    @classmethod
+    async def record_request(cls, address: EthAddress) -> None:
+        return await executor.write(_gcra_record_request, address)
+
+
+@db_session
+def _indexed_active_plan_ids_for(
+    subscriber: str, signers: list[str], t: float
+) -> dict[str, tuple[int, ...]]:
+    active_plan_ids_for: dict[str, tuple[int, ...]] = dict.fromkeys(signers, ())
+    rows = select(
+        (s.signer, s.plan_id)
+        for s in IndexedSubscription
+        if s.subscriber == subscriber and s.signer in signers and s.subscription_end > t
+    )
+    for signer, plan_id in rows:
+        active_plan_ids_for[signer] += (plan_id,)
+    return active_plan_ids_for
+
+
+@db_session(immediate=True)
+def _index_subscription_ends(
+    subscriber: str, ends_for: dict[str, dict[int, int]], block: int
+) -> None:
+    # NOTE: Each signer's rows are replaced as a whole, so plans they no longer hold don't linger.
+    connection = db.get_connection()
+    connection.executemany(
+        "DELETE FROM indexed_subscriptions WHERE subscriber = ? AND signer = ?",
+        [(subscriber, signer) for signer in ends_for],
+    )
+    connection.executemany(
+        "INSERT INTO indexed_subscriptions (subscriber, signer, plan_id, subscription_end) VALUES (?, ?, ?, ?)",
+        [
+            (subscriber, signer, plan_id, end)
+            for signer, ends in ends_for.items()
+            for plan_id, end in ends.items()
+        ],
+    )
+    # NOTE: The checkpoint moves in the same transaction, so a crash never skips or double counts a block range.
+    connection.execute(
+        "INSERT INTO indexer_checkpoints (subscriber, block) VALUES (?, ?) "
+        "ON CONFLICT (subscriber) DO UPDATE SET block = excluded.block",
+        (subscriber, block),
+    )
+
+
+class IndexedSubscription(db.Entity):
+    """Holds the subscription end of one signer on one plan of one Subscriber contract, as of the last indexed block."""
+
+    _table_ = "indexed_subscriptions"
+
+    subscriber = Required(str)
+    signer = Required(str)
+    plan_id = Required(int)
+    subscription_end = Required(int, size=64)
+    PrimaryKey(subscriber, signer, plan_id)
+
+    @classmethod
+    async def active_plan_ids_for(
+        cls, subscriber: str, signers: list[str]
+    ) -> dict[str, tuple[int, ...]]:
+        return await executor.read(_indexed_active_plan_ids_for, subscriber, signers, time())
+
+    @classmethod
+    async def index(cls, subscriber: str, ends_for: dict[str, dict[int, int]], block: int) -> None:
+        return await executor.write(_index_subscription_ends, subscriber, ends_for, block)
+
+
+@db_session
+def _get_checkpoint(subscriber: str) -> int | None:
+    checkpoint = IndexerCheckpoint.get(subscriber=subscriber)
+    return checkpoint.block if checkpoint else None
+
+
+class IndexerCheckpoint(db.Entity):
+    """Holds the last block whose events have been indexed for each Subscriber contract."""
+
+    _table_ = "indexer_checkpoints"
+
+    subscriber = PrimaryKey(str)
+    block = Required(int)
+
+    @classmethod
+    async def get_block(cls, subscriber: str) -> int | None:
+        return await executor.read(_get_checkpoint, subscriber)
+
+
+@db_session
+def _newest_stale_rowid(table: str, condition: str, threshold: float) -> int | None:
+    return (
+        db.get_connection()
+        .execute(f"SELECT max(rowid) FROM {table} WHERE {condition}", {"threshold": threshold})
+        .fetchone()[0]
+    )
+
+
+@db_session(immediate=True)
+def _prune_stale_batch(
+    table: str, condition: str, threshold: float, max_rowid: int, batch_size: int
+) -> int:
+    # NOTE: Only rows up to 'max_rowid' are scanned, so each batch walks the rowid index instead of the whole table.
+    cursor = db.get_connection().execute(
+        f"DELETE FROM {table} WHERE rowid IN "
+        f"(SELECT rowid FROM {table} WHERE rowid <= :max_rowid AND {condition} "
+        "ORDER BY rowid LIMIT :batch_size)",
+        {"threshold": threshold, "max_rowid": max_rowid, "batch_size": batch_size},
+    )
+    return cursor.rowcount
+
+
+@db_session(immediate=True)
+def _incremental_vacuum() -> None:
+    db.get_connection().execute("PRAGMA incremental_vacuum")
+
+
+async def prune_stale(
+    batch_size: int = _config.DB_COMPACTION_BATCH_SIZE,
+    vacuum: bool = _config.DB_INCREMENTAL_VACUUM,
+) -> int:
+    """
+    Deletes request history and limiter state that can no longer affect a limit, 'batch_size' rows per transaction.
+    Returns the number of rows deleted.
+    """
+    t = time()
+    stale = [
+        ("user_requests", "timestamp <= :threshold", t - ONE_DAY),
+        # NOTE: Buckets are at most a minute wide, so one that started over a day and a minute ago is fully expired.
+        ("user_request_buckets", "start <= :threshold", t - ONE_DAY - ONE_MINUTE),
+        ("user_limiter_states", "minute_tat <= :threshold AND day_tat <= :threshold", t),
+    ]
+    deleted = 0
+    for table, condition, threshold in stale:
+        # NOTE: The one full scan happens here, on a reader, so it never holds up writers.
+        max_rowid = await executor.read(_newest_stale_rowid, table, condition, threshold)
+        if max_rowid is None:
+            continue
+        while True:
+            count = await executor.write(
+                _prune_stale_batch, table, condition, threshold, max_rowid, batch_size
+            )
+            deleted += count
+            if count < batch_size:
+                break
+    if vacuum:
+        await executor.write(_incremental_vacuum)
+    return deleted
+
+
+async def compact_periodically(interval: float = _config.DB_COMPACTION_INTERVAL) -> None:
+    while True:
+        await sleep(interval)
+        try:
+            await prune_stale()
+        except Exception:
+            logger.exception("failed to prune stale rows from the ysubs database")
+
+
+_compactor: Task | None = None
+
+
+def start_compaction() -> None:
+    """Starts pruning stale rows in the background, unless this process is already doing so."""
+    global _compactor
+    if _compactor is None or _compactor.done():
+        _compactor = create_task(compact_periodically())
 
 
-db.bind(provider="sqlite", filename=_config.DB_PATH, create_db=True)
-db.generate_mapping(create_tables=True)
+def stop_compaction() -> None:
+    """Stops pruning stale rows in the background, if this process was doing so."""
+    global _compactor
+    if _compactor is not None:
+        _compactor.cancel()
+        _compactor = None
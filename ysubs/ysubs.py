@@ -1,29 +1,43 @@
-from asyncio import gather
-from collections.abc import Awaitable, Callable, Iterable
-from functools import lru_cache
+import logging
+from asyncio import Semaphore, Task
+from asyncio import TimeoutError as AsyncioTimeoutError
+from asyncio import create_task, gather, wait_for
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterable, Mapping
 from http import HTTPStatus
 from inspect import isawaitable
-from typing import Any, TypeVar, Union
+from math import inf
+from time import perf_counter, time
+from typing import TYPE_CHECKING, Any, TypeVar, Union
 
 import a_sync
 from brownie import convert
 from brownie.convert.datatypes import EthAddress
 from eth_typing import ChecksumAddress
 
+from ysubs import _config
+from ysubs.backends import BackendSpec, MemoryBackend, get_backend
 from ysubs.exceptions import (
     BadInput,
+    MalformedSignature,
     NoActiveSubscriptions,
     SignatureError,
     SignatureNotAuthorized,
     SignatureNotProvided,
     SignerInvalid,
     SignerNotProvided,
+    SubscriptionLookupTimeout,
     TooManyRequests,
 )
 from ysubs.plan import FreeTrial, Plan
 from ysubs.subscriber import Subscriber
 from ysubs.subscription import Subscription, SubscriptionsLimiter
-from ysubs.utils import sentry, signatures
+from ysubs.utils import metrics, sentry, signatures
+from ysubs.utils.cache import CacheInfo, TTLCache
+from ysubs.utils.singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from starlette.requests import HTTPConnection
 
 T = TypeVar("T")
 
@@ -32,6 +46,8 @@ EscapeHatch = Union[Callable[[T], bool], Callable[[T], Awaitable[bool]]]
 RequestEscapeHatch = EscapeHatch["Request"]
 HeadersEscapeHatch = EscapeHatch[dict]
 
+logger = logging.getLogger(__name__)
+
 try:
     import sentry_sdk
 except ImportError:
@@ -47,10 +63,23 @@ class ySubs(a_sync.ASyncGenericBase):
         free_trial_rate_limit: int | None = None,
         _request_escape_hatch: RequestEscapeHatch | None = None,
         _headers_escape_hatch: HeadersEscapeHatch | None = None,
+        signature_executor: signatures.ExecutorSpec | None = None,
+        limiter_backend: BackendSpec = "sqlite",
+        lookup_timeout: float | None = _config.SUBSCRIPTION_LOOKUP_TIMEOUT,
+        max_staleness: float = _config.SUBSCRIPTION_MAX_STALENESS,
+        index_subscriptions: bool = False,
+        index_start_blocks: Mapping[str, int] | None = None,
+        _subscribers: list[Subscriber] | None = None,
     ) -> None:
         """
         addresses: an iterable of addresses for Subscriber contracts that you have deployed for your program
         url: your website for your service
+        signature_executor: an Executor, "thread", or "process" to recover signatures off of the event loop
+        limiter_backend: a LimiterBackend, "sqlite", "memory", "gcra", or "redis" to enforce rate limits
+        lookup_timeout: the most time, in seconds, a request may wait on the chain for a signer's subscriptions, or None to wait indefinitely
+        max_staleness: for how long, in seconds, a signer's last known subscriptions may be served when a lookup times out
+        index_subscriptions: if True, follow each Subscriber's events into the local ysubs database and answer lookups from there
+        index_start_blocks: maps Subscriber addresses to the blocks they were deployed at, where a fresh index starts. Missing ones are looked up from the chain
         """
 
         if not isinstance(url, str):
@@ -60,6 +89,7 @@ class ySubs(a_sync.ASyncGenericBase):
         if not isinstance(asynchronous, bool):
             raise TypeError(f"'asynchronous' must be boolean. You passed {asynchronous}")
         self.asynchronous = asynchronous
+        super().__init__()
 
         if free_trial_rate_limit is not None and not isinstance(free_trial_rate_limit, int):
             raise TypeError(
@@ -85,9 +115,93 @@ class ySubs(a_sync.ASyncGenericBase):
             raise TypeError(msg)
         self._headers_escape_hatch = _headers_escape_hatch
 
-        self.subscribers = [Subscriber(address, asynchronous=asynchronous) for address in addresses]
-        self._free_trials: dict[str, Subscription] = {}
-        self._checksummed: set[EthAddress] = set()
+        if lookup_timeout is not None and not lookup_timeout > 0:
+            raise ValueError(
+                f"'lookup_timeout' must be a positive number or 'None'. You passed {lookup_timeout}"
+            )
+        self.lookup_timeout = lookup_timeout
+        # NOTE: Every successful lookup is kept here so we have something to serve if the chain is slow.
+        self._last_known_subscriptions: TTLCache[str, list[Subscription]] = TTLCache(
+            _config.SUBSCRIPTION_CACHE_SIZE, max_staleness
+        )
+
+        self._signature_validator = signatures.SignatureValidator(signature_executor)
+        self.backend = get_backend(limiter_backend)
+        # NOTE: WebSocket messages are checked in memory so streaming clients don't cost a database write per message.
+        #       Each connection charges its messages to 'backend' in batches, so they still count toward the user's limits.
+        self._websocket_backend = MemoryBackend()
+        self._limiter_lookups: SingleFlight[tuple[str, str], SubscriptionsLimiter] = SingleFlight()
+        self._subscription_lookups: SingleFlight[str, list[Subscription]] = SingleFlight()
+
+        # NOTE: Rejections are remembered so repeat offenders are turned away before we checksum, recover or query anything.
+        #       Signers are rejected for being invalid or unsubscribed, signatures only for being malformed, since
+        #       anybody could pair a valid signature with the wrong signer.
+        self._rejected_signers: TTLCache[str, SignatureError] = TTLCache(
+            _config.REJECTION_CACHE_SIZE, _config.REJECTION_CACHE_TTL
+        )
+        self._rejected_signatures: TTLCache[str, MalformedSignature] = TTLCache(
+            _config.REJECTION_CACHE_SIZE, _config.REJECTION_CACHE_TTL
+        )
+        self.rejections: Counter[str] = Counter()
+        self._warm_up_task: Task | None = None
+
+        index_start_blocks = index_start_blocks or {}
+        self.subscribers = _subscribers or [
+            Subscriber(
+                address,
+                asynchronous=asynchronous,
+                indexed=index_subscriptions,
+                index_start_block=index_start_blocks.get(address),
+            )
+            for address in addresses
+        ]
+        # NOTE: Maps each X-Signer header we've seen to its checksummed address. Checksums never change, so entries only leave by eviction.
+        self._checksummed: TTLCache[str, EthAddress] = TTLCache(_config.CHECKSUM_CACHE_SIZE, inf)
+        # NOTE: We register last so a failed constructor never leaves a half-built instance behind to be rendered.
+        metrics.register_collector(self._collect_metrics)
+
+    @classmethod
+    async def create(
+        cls,
+        addresses: Iterable[ChecksumAddress],
+        url: str,
+        asynchronous: bool = True,
+        index_subscriptions: bool = False,
+        index_start_blocks: Mapping[str, int] | None = None,
+        warm_up: bool = False,
+        **kwargs: Any,
+    ) -> "ySubs":
+        """
+        Builds a ySubs instance without blocking the event loop. Use this instead of the constructor inside a running app.
+
+        Every Subscriber's contract is loaded at the same time, and their plan catalogs are loaded before we return,
+        so the first requests don't pay for them. If 'warm_up' is True, recently active users' subscriptions are
+        then prefetched in the background. Any other keyword arguments are passed to the constructor.
+        """
+        index_start_blocks = index_start_blocks or {}
+        subscribers = await gather(
+            *[
+                Subscriber.create(
+                    address,
+                    asynchronous=asynchronous,
+                    indexed=index_subscriptions,
+                    index_start_block=index_start_blocks.get(address),
+                )
+                for address in addresses
+            ]
+        )
+        await gather(*[subscriber.__catalog__(sync=False) for subscriber in subscribers])
+        ysubs = cls(
+            [subscriber.contract.address for subscriber in subscribers],
+            url,
+            asynchronous=asynchronous,
+            index_subscriptions=index_subscriptions,
+            _subscribers=subscribers,
+            **kwargs,
+        )
+        if warm_up:
+            ysubs.start_warm_up()
+        return ysubs
 
     ##########
     # System #
@@ -103,8 +217,92 @@ class ySubs(a_sync.ASyncGenericBase):
         )
         return dict(zip(self.subscribers, plans))
 
-    @lru_cache(maxsize=None)
+    async def warm_up(
+        self,
+        window: float = _config.WARM_UP_WINDOW,
+        limit: int = _config.WARM_UP_LIMIT,
+        batch_size: int = _config.WARM_UP_BATCH_SIZE,
+        concurrency: int = _config.WARM_UP_CONCURRENCY,
+    ) -> int:
+        """
+        Prefetches the active subscriptions of users who made requests in the last 'window' seconds, so their first
+        requests after a restart are served from cache. Returns the number of users prefetched.
+
+        Users are read from the local ysubs database, most recent first, and looked up 'batch_size' at a time with at most
+        'concurrency' batches in flight. Signatures can't be verified ahead of time since we don't store them.
+        """
+        from ysubs.utils.sqlite import User
+
+        signers = await User.recently_active(time() - window, limit)
+        semaphore = Semaphore(concurrency)
+        prefetched = 0
+
+        async def prefetch(batch: list[str]) -> None:
+            nonlocal prefetched
+            async with semaphore:
+                try:
+                    await self._get_paid_subscriptions_many(batch)
+                except Exception:
+                    # NOTE: This only warms caches, a failed batch will just be looked up on demand.
+                    logger.warning(
+                        "failed to prefetch subscriptions for %s users", len(batch), exc_info=True
+                    )
+                else:
+                    prefetched += len(batch)
+
+        await gather(
+            *[prefetch(signers[i : i + batch_size]) for i in range(0, len(signers), batch_size)]
+        )
+        logger.info(
+            "prefetched subscriptions for %s of %s recently active users", prefetched, len(signers)
+        )
+        return prefetched
+
+    def start_warm_up(self, **kwargs: Any) -> Task:
+        """Runs `warm_up` in the background so the app can serve requests meanwhile. Accepts the same arguments."""
+        # NOTE: The event loop only keeps a weak reference to tasks, so we hold this one until it's done.
+        self._warm_up_task = create_task(self.warm_up(sync=False, **kwargs))
+        return self._warm_up_task
+
+    async def close(self) -> None:
+        """Stops any background tasks, then flushes and releases any resources held by the limiter backend. Call this on shutdown."""
+        metrics.unregister_collector(self._collect_metrics)
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            self._warm_up_task = None
+        for subscriber in self.subscribers:
+            subscriber.close()
+        self._signature_validator.close()
+        await self.backend.close()
+
+    def rejection_info(self) -> dict[str, Any]:
+        """
+        Returns how many requests were rejected, by reason, along with the state of the rejection caches.
+        Requests turned away by the caches are counted under "cached" as well as under their reason.
+        """
+        return {
+            "rejections": dict(self.rejections),
+            "signers": self._rejected_signers.cache_info(),
+            "signatures": self._rejected_signatures.cache_info(),
+        }
+
+    def cache_info(self) -> dict[str, CacheInfo]:
+        """
+        Returns the hits, misses, bound and current size of every in-memory cache used by this ySubs instance.
+        """
+        info = {
+            "checksums": self._checksummed.cache_info(),
+            "rejected_signers": self._rejected_signers.cache_info(),
+            "rejected_signatures": self._rejected_signatures.cache_info(),
+        }
+        for name, cache_info in signatures.cache_info().items():
+            info[f"signatures.{name}"] = cache_info
+        for subscriber in self.subscribers:
+            info[f"{subscriber.contract.address}.active_plan_ids"] = subscriber.cache_info()
+        return info
+
     def _get_free_trial(self, signer: str) -> Subscription:
+        # NOTE: This is cheap enough to build for every request, so we don't keep one around per signer.
         return Subscription(signer, self.free_trial)
 
     #################
@@ -116,17 +314,7 @@ class ySubs(a_sync.ASyncGenericBase):
         """
         Returns all active subscriptions for either 'signer' or the user who signed 'signature'
         """
-        active_subscriptions = [
-            sub
-            for subs in await gather(
-                *[
-                    subscriber.get_active_subscriptions(signer, sync=False)
-                    for subscriber in self.subscribers
-                ]
-            )
-            for sub in subs
-            if sub
-        ]
+        active_subscriptions = list(await self._lookup_paid_subscriptions(signer))
         if not active_subscriptions:
             if self.free_trial is not None:
                 active_subscriptions.append(self._get_free_trial(signer))
@@ -134,14 +322,33 @@ class ySubs(a_sync.ASyncGenericBase):
                 raise NoActiveSubscriptions(signer)
         return active_subscriptions
 
+    @sentry.trace
+    async def get_active_subscriptions_many(
+        self, signers: Iterable[str]
+    ) -> dict[str, list[Subscription]]:
+        """
+        Returns all active subscriptions for each of 'signers'.
+
+        Lookups for every signer on every Subscriber are issued together so they can share a single multicall.
+        Signers without an active subscription map to the free trial, if enabled, or to an empty list.
+        """
+        active_subscriptions = await self._get_paid_subscriptions_many(signers)
+        if self.free_trial is not None:
+            for signer, subs in active_subscriptions.items():
+                if not subs:
+                    subs.append(self._get_free_trial(signer))
+        return active_subscriptions
+
     ##############
     # Validation #
     ##############
 
     @sentry.trace
     async def get_limiter(self, signer: str, signature: str) -> SubscriptionsLimiter:
-        signatures.validate_signer_with_signature(signer, signature)
-        return SubscriptionsLimiter(await self.get_active_subscripions(signer, sync=False))
+        # NOTE: A burst of parallel requests from one client shares a single validation.
+        return await self._limiter_lookups.do(
+            (signer, signature), lambda: self._get_limiter(signer, signature)
+        )
 
     @sentry.trace
     async def validate_signature(self, signer: str, signature: str) -> SubscriptionsLimiter:
@@ -165,9 +372,23 @@ class ySubs(a_sync.ASyncGenericBase):
             raise SignerNotProvided(self, headers)
         if "X-Signature" not in headers or not headers["X-Signature"]:
             raise SignatureNotProvided(self, headers)
-        return await self.validate_signature(
-            self._checksum(headers["X-Signer"]), headers["X-Signature"], sync=False
-        )
+        signer, signature = headers["X-Signer"], headers["X-Signature"]
+        if (e := self._get_cached_rejection(signer, signature)) is not None:
+            self._count_rejection(e, cached=True)
+            raise e.with_traceback(None)
+        try:
+            start = perf_counter()
+            checksummed = self._checksum(signer)
+            metrics.observe("ysubs_stage_seconds", perf_counter() - start, stage="checksum")
+            return await self.validate_signature(checksummed, signature, sync=False)
+        except (SignerInvalid, SignatureNotAuthorized) as e:
+            self._rejected_signers.set(signer, e)
+            self._count_rejection(e)
+            raise
+        except MalformedSignature as e:
+            self._rejected_signatures.set(signature, e)
+            self._count_rejection(e)
+            raise
 
     ###############
     # Middlewares #
@@ -196,53 +417,316 @@ class ySubs(a_sync.ASyncGenericBase):
     ############
 
     def _get_starlette_middleware(self, response_cls: type):
-        from starlette.middleware.base import BaseHTTPMiddleware
-        from starlette.requests import HTTPConnection
+        from starlette.datastructures import Headers
+        from starlette.requests import HTTPConnection, Request
+        from starlette.status import WS_1008_POLICY_VIOLATION, WS_1013_TRY_AGAIN_LATER
+        from starlette.types import ASGIApp, Message, Receive, Scope, Send
+        from starlette.websockets import WebSocketDisconnect
 
         # NOTE: We don't want to block any files used for the documentation pages.
         do_not_block = ["/favicon.ico", "/openapi.json"]
 
-        class SignatureMiddleware(BaseHTTPMiddleware):
-            async def dispatch(
-                self_mw,
-                request: HTTPConnection,
-                call_next: Callable[[HTTPConnection], T],
-            ) -> T:
-                if self_mw.__is_documenation(
-                    request.url.path
-                ) or await self._should_use_requests_escape_hatch(request):
-                    return await call_next(request)
+        class SignatureMiddleware:
+            """
+            A pure ASGI middleware. Unlike BaseHTTPMiddleware, it doesn't spawn a task or wrap the response body
+            for each request, so streaming responses and background tasks work as usual.
+            """
+
+            def __init__(self_mw, app: ASGIApp) -> None:
+                self_mw.app = app
+
+            async def __call__(self_mw, scope: Scope, receive: Receive, send: Send) -> None:
+                if scope["type"] == "websocket":
+                    return await self_mw.__call_websocket(scope, receive, send)
+                if scope["type"] != "http" or self_mw.__is_documenation(scope["path"]):
+                    return await self_mw.app(scope, receive, send)
+                if self._request_escape_hatch is not None:
+                    if await self._should_use_requests_escape_hatch(Request(scope, receive)):
+                        metrics.increment("ysubs_requests_total", outcome="escape_hatch")
+                        return await self_mw.app(scope, receive, send)
+                headers = Headers(scope=scope)
                 try:
-                    user_limiter = await self.validate_signature_from_headers(
-                        request.headers, sync=False
-                    )
+                    user_limiter = await self.validate_signature_from_headers(headers, sync=False)
                     if user_limiter is True:
-                        return await call_next(request)
+                        metrics.increment("ysubs_requests_total", outcome="escape_hatch")
+                        return await self_mw.app(scope, receive, send)
                     if sentry_sdk:
-                        sentry_sdk.set_user({"id": request.headers["X-Signer"]})
-                    async with user_limiter:
-                        return await call_next(request)
+                        sentry_sdk.set_user({"id": headers["X-Signer"]})
+                    start = perf_counter()
+                    try:
+                        await user_limiter.__aenter__()
+                    finally:
+                        metrics.observe(
+                            "ysubs_stage_seconds", perf_counter() - start, stage="limiter"
+                        )
                 except BadInput as e:
-                    return response_cls(
+                    response = response_cls(
                         status_code=HTTPStatus.BAD_REQUEST, content={"message": str(e)}
                     )
                 except SignatureError as e:
-                    return response_cls(
+                    response = response_cls(
                         status_code=HTTPStatus.UNAUTHORIZED, content={"message": str(e)}
                     )
                 except TooManyRequests as e:
-                    return response_cls(
+                    response = response_cls(
                         status_code=HTTPStatus.TOO_MANY_REQUESTS,
                         content={"message": str(e)},
                     )
+                except SubscriptionLookupTimeout as e:
+                    response = response_cls(
+                        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                        content={"message": str(e)},
+                    )
+                else:
+                    metrics.increment("ysubs_requests_total", outcome="admitted")
+                    try:
+                        return await self_mw.app(scope, receive, send)
+                    finally:
+                        await user_limiter.__aexit__(None, None, None)
+                metrics.increment("ysubs_requests_total", outcome=str(int(response.status_code)))
+                await response(scope, receive, send)
+
+            async def __call_websocket(self_mw, scope: Scope, receive: Receive, send: Send) -> None:
+                """
+                Validates the signature once, at the handshake. The connection then keeps its limiter, each message
+                it receives counts as a request, and its subscriptions are checked again every VALIDATION_INTERVAL.
+
+                Messages are checked in memory and charged to the limiter backend every WEBSOCKET_FLUSH_SIZE messages
+                or WEBSOCKET_FLUSH_INTERVAL seconds, so they share the user's limits with their HTTP requests.
+                """
+                if self._request_escape_hatch is not None:
+                    # NOTE: A handshake isn't a Request, but it has the same url, headers and client.
+                    if await self._should_use_requests_escape_hatch(HTTPConnection(scope)):
+                        return await self_mw.app(scope, receive, send)
+                # NOTE: We take the connect message so we can refuse the handshake, then hand it to the app if we don't.
+                connect = await receive()
+                headers = Headers(scope=scope)
+                try:
+                    user_limiter = await self.validate_signature_from_headers(headers, sync=False)
+                    if user_limiter is not True:
+                        if sentry_sdk:
+                            sentry_sdk.set_user({"id": headers["X-Signer"]})
+                        await user_limiter.__aenter__()
+                except Exception as e:
+                    if (code := _websocket_close_code(e)) is None:
+                        raise
+                    return await send(_websocket_close(code, e))
+                websocket = (
+                    _UnlimitedWebSocket(connect, receive, send)
+                    if user_limiter is True
+                    else _LimitedWebSocket(connect, receive, send, headers, user_limiter)
+                )
+                try:
+                    await self_mw.app(scope, websocket.receive, websocket.send)
+                finally:
+                    if isinstance(websocket, _LimitedWebSocket):
+                        await websocket.finish()
 
             def __is_documenation(self_mw, path: str):
                 """We don't want to block calls to the documentation pages."""
                 return path.startswith("/docs") or path.startswith("/redoc") or path in do_not_block
 
+        def _websocket_close_code(e: Exception) -> int | None:
+            if isinstance(e, (BadInput, SignatureError, TooManyRequests)):
+                return WS_1008_POLICY_VIOLATION
+            if isinstance(e, SubscriptionLookupTimeout):
+                return WS_1013_TRY_AGAIN_LATER
+            return None
+
+        def _websocket_close(code: int, e: Exception) -> Message:
+            metrics.increment("ysubs_websocket_closes_total", code=str(code))
+            # NOTE: A close reason can be at most 123 bytes long.
+            reason = str(e).encode()[:123].decode(errors="ignore")
+            return {"type": "websocket.close", "code": code, "reason": reason}
+
+        class _UnlimitedWebSocket:
+            def __init__(self_ws, connect: Message, receive: Receive, send: Send) -> None:
+                self_ws._connect = connect
+                self_ws._receive = receive
+                self_ws._send = send
+
+            async def receive(self_ws) -> Message:
+                if self_ws._connect is not None:
+                    message, self_ws._connect = self_ws._connect, None
+                    return message
+                return await self_ws._receive()
+
+            async def send(self_ws, message: Message) -> None:
+                await self_ws._send(message)
+
+        class _LimitedWebSocket(_UnlimitedWebSocket):
+            def __init__(
+                self_ws,
+                connect: Message,
+                receive: Receive,
+                send: Send,
+                headers: Headers,
+                user_limiter: SubscriptionsLimiter,
+            ) -> None:
+                super().__init__(connect, receive, send)
+                self_ws._headers = headers
+                self_ws._limiter = user_limiter
+                self_ws._recheck_at = time() + _config.VALIDATION_INTERVAL
+                self_ws._closed: Message | None = None
+                # NOTE: Messages admitted in memory but not yet charged to the limiter backend.
+                self_ws._uncharged = 0
+                self_ws._charge_at = time() + _config.WEBSOCKET_FLUSH_INTERVAL
+                # NOTE: The backend told us the user has used up their limits until then.
+                self_ws._blocked_until = 0.0
+
+            async def receive(self_ws) -> Message:
+                if self_ws._closed:
+                    return {"type": "websocket.disconnect", "code": self_ws._closed["code"]}
+                message = await super().receive()
+                if message["type"] == "websocket.receive":
+                    try:
+                        await self_ws._recheck()
+                        if (blocked := self_ws._blocked_until - time()) > 0:
+                            raise TooManyRequests(blocked)
+                        subscriptions = self_ws._limiter.subscriptions
+                        if next := await self._websocket_backend.check_and_record(subscriptions):
+                            raise TooManyRequests(next)
+                        self_ws._uncharged += 1
+                        if (
+                            self_ws._uncharged >= _config.WEBSOCKET_FLUSH_SIZE
+                            or time() >= self_ws._charge_at
+                        ):
+                            await self_ws._charge()
+                    except Exception as e:
+                        if (code := _websocket_close_code(e)) is None:
+                            raise
+                        return await self_ws._close(code, e)
+                return message
+
+            async def send(self_ws, message: Message) -> None:
+                if self_ws._closed:
+                    raise WebSocketDisconnect(self_ws._closed["code"], self_ws._closed["reason"])
+                if message["type"] == "websocket.send":
+                    # NOTE: We also check here so connections that only stream to the client expire too.
+                    try:
+                        await self_ws._recheck()
+                    except Exception as e:
+                        if (code := _websocket_close_code(e)) is None:
+                            raise
+                        await self_ws._close(code, e)
+                        raise WebSocketDisconnect(code, self_ws._closed["reason"])
+                await self_ws._send(message)
+
+            async def finish(self_ws) -> None:
+                """Charges any remaining messages once the connection is over."""
+                try:
+                    await self_ws._charge()
+                except Exception:
+                    logger.warning("failed to charge WebSocket messages", exc_info=True)
+
+            async def _charge(self_ws) -> None:
+                count, self_ws._uncharged = self_ws._uncharged, 0
+                self_ws._charge_at = time() + _config.WEBSOCKET_FLUSH_INTERVAL
+                subscriptions = self_ws._limiter.subscriptions
+                if count:
+                    await self.backend.record_requests(subscriptions[0].user, count)
+                # NOTE: The backend also counts the user's HTTP requests and other connections, so it decides
+                #       whether they have room left until the next charge.
+                next = min(await gather(*map(self.backend.time_til_next, subscriptions)))
+                self_ws._blocked_until = time() + next if next else 0.0
+
+            async def _recheck(self_ws) -> None:
+                if time() < self_ws._recheck_at:
+                    return
+                user_limiter = await self.validate_signature_from_headers(
+                    self_ws._headers, sync=False
+                )
+                if user_limiter is not True:
+                    self_ws._limiter = user_limiter
+                self_ws._recheck_at = time() + _config.VALIDATION_INTERVAL
+
+            async def _close(self_ws, code: int, e: Exception) -> Message:
+                self_ws._closed = _websocket_close(code, e)
+                await self_ws._send(self_ws._closed)
+                return {"type": "websocket.disconnect", "code": code}
+
         return SignatureMiddleware
 
-    async def _should_use_requests_escape_hatch(self, request: "Request") -> bool:
+    async def _get_limiter(self, signer: str, signature: str) -> SubscriptionsLimiter:
+        start = perf_counter()
+        try:
+            await self._signature_validator.validate(signer, signature)
+        finally:
+            metrics.observe("ysubs_stage_seconds", perf_counter() - start, stage="recovery")
+        start = perf_counter()
+        try:
+            subscriptions = await self.get_active_subscripions(signer, sync=False)
+        finally:
+            metrics.observe("ysubs_stage_seconds", perf_counter() - start, stage="lookup")
+        return SubscriptionsLimiter(subscriptions, self.backend)
+
+    async def _lookup_paid_subscriptions(self, signer: str) -> list[Subscription]:
+        # NOTE: Concurrent lookups for the same signer share one set of RPC calls.
+        lookup = self._subscription_lookups.do(signer, lambda: self._get_paid_subscriptions(signer))
+        if self.lookup_timeout is None:
+            return await lookup
+        try:
+            # NOTE: The lookup is shielded, so on timeout it keeps running and refreshes the last known state.
+            return await wait_for(lookup, self.lookup_timeout)
+        except AsyncioTimeoutError:
+            if (last_known := self._last_known_subscriptions.get(signer)) is not None:
+                return last_known
+            raise SubscriptionLookupTimeout(signer, self.lookup_timeout) from None
+
+    async def _get_paid_subscriptions_many(
+        self, signers: Iterable[str]
+    ) -> dict[str, list[Subscription]]:
+        signers = list(dict.fromkeys(signers))
+        by_subscriber = await gather(
+            *[
+                subscriber.get_active_subscriptions_many(signers, sync=False)
+                for subscriber in self.subscribers
+            ]
+        )
+        paid_subscriptions = {}
+        for signer in signers:
+            subscriptions = [sub for subs in by_subscriber for sub in subs[signer] if sub]
+            self._last_known_subscriptions.set(signer, list(subscriptions))
+            paid_subscriptions[signer] = subscriptions
+        return paid_subscriptions
+
+    async def _get_paid_subscriptions(self, signer: str) -> list[Subscription]:
+        subscriptions = [
+            sub
+            for subs in await gather(
+                *[
+                    subscriber.get_active_subscriptions(signer, sync=False)
+                    for subscriber in self.subscribers
+                ]
+            )
+            for sub in subs
+            if sub
+        ]
+        self._last_known_subscriptions.set(signer, subscriptions)
+        return subscriptions
+
+    def _count_rejection(self, e: Exception, cached: bool = False) -> None:
+        reason = type(e).__name__
+        if cached:
+            self.rejections["cached"] += 1
+        self.rejections[reason] += 1
+        metrics.increment("ysubs_rejections_total", reason=reason, cached=str(cached).lower())
+
+    def _collect_metrics(self) -> None:
+        for cache, info in self.cache_info().items():
+            metrics.gauge("ysubs_cache_hits", info.hits, cache=cache)
+            metrics.gauge("ysubs_cache_misses", info.misses, cache=cache)
+            metrics.gauge("ysubs_cache_size", info.currsize, cache=cache)
+            metrics.gauge("ysubs_cache_maxsize", info.maxsize, cache=cache)
+
+    def _get_cached_rejection(
+        self, signer: str, signature: str
+    ) -> SignatureError | BadInput | None:
+        if (e := self._rejected_signers.get(signer)) is not None:
+            return e
+        return self._rejected_signatures.get(signature)
+
+    async def _should_use_requests_escape_hatch(self, request: "HTTPConnection") -> bool:
         if self._request_escape_hatch is None:
             return False
         hatch = self._request_escape_hatch(request)
@@ -267,12 +751,12 @@ class ySubs(a_sync.ASyncGenericBase):
         )
 
     def _checksum(self, signer: str) -> EthAddress:
-        if signer not in self._checksummed:
+        if (checksummed := self._checksummed.get(signer)) is None:
             try:
-                signer = convert.to_address(signer)
+                checksummed = convert.to_address(signer)
             except ValueError as e:
-                if "is not a valid ETH address" not in e:
+                if "is not a valid ETH address" not in str(e):
                     raise e
                 raise SignerInvalid(signer)
-            self._checksummed.add(signer)
-        return signer
+            self._checksummed.set(signer, checksummed)
+        return checksummed